@@ -0,0 +1,92 @@
+"""
+Synthetic support logs with the schema from README.md, for benchmarks and demos.
+
+    python -m benchmarks.generate --rows 100000 --out support_100k.csv
+    python -m benchmarks.generate --rows 30000 --months 3 --out support_q1.xlsx
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metrics.metric2_most_features import FEATURES_LIST
+from metrics.metric5_top_sales_curiosity import SALES_LIST
+
+TIERS = ["BUG", "CODE", "FIRST LAYER", "OPERATION", "REQUEST", "SECOND LAYER", "TRAINING"]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+ISSUE_TOPICS = ["reminder inquiries", "cannot sync", "report mismatch", "setup help", "printer issue",
+                "login problem", "wrong total", "how to export", "permission request", "slow loading"]
+
+
+def zipf_weights(n, skew=1.1):
+    """Long-tailed popularity: a few merchants/features account for most questions"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def generate_support_log(rows=10_000, merchants=500, sales_reps=None, weeks=4, month="JAN", seed=0) -> pd.DataFrame:
+    """
+    One month of support questions. Merchants and features follow a long-tailed
+    distribution, each merchant keeps one sales rep, and about 2% of the optional
+    cells are blank like in the real sheets.
+    """
+    rng = np.random.default_rng(seed)
+    sales_names = list(SALES_LIST) if sales_reps is None else [f"Sales {i + 1}" for i in range(sales_reps)]
+    features = list(dict.fromkeys(FEATURES_LIST))
+
+    merchant_names = np.array([f"Merchant {i + 1:05d}" for i in range(merchants)], dtype=object)
+    merchant_sales = rng.choice(np.array(sales_names, dtype=object), merchants)
+    merchant_idx = rng.choice(merchants, rows, p=zipf_weights(merchants))
+
+    # Mixed week label styles, as typed by different people
+    prefixes = np.array([f"{month} W", "Week ", "W"], dtype=object)[rng.integers(0, 3, rows)]
+    week_numbers = pd.Series(rng.integers(1, weeks + 1, rows)).astype(str)
+    week_labels = pd.Series(prefixes).str.cat(week_numbers).to_numpy()
+
+    feature = rng.choice(np.array(features, dtype=object), rows, p=zipf_weights(len(features), skew=0.8))
+    topic = rng.choice(np.array(ISSUE_TOPICS, dtype=object), rows)
+
+    df = pd.DataFrame({
+        "Week": week_labels,
+        "Merchants": merchant_names[merchant_idx],
+        "Sales": merchant_sales[merchant_idx],
+        "Issue": pd.Series(feature).str.slice(0, 5).str.cat(topic, sep=" > ").to_numpy(),
+        "Features Category": feature,
+        "IT Support Tier": rng.choice(np.array(TIERS, dtype=object), rows, p=[0.1, 0.1, 0.3, 0.2, 0.15, 0.1, 0.05]),
+    })
+    for col in ["Sales", "Features Category", "IT Support Tier"]:
+        df.loc[rng.random(rows) < 0.02, col] = None
+    return df
+
+
+def generate_workbook(path, rows_per_month=10_000, months=3, seed=0, **kwargs):
+    """Write a workbook with one sheet per month (Jan, Feb, ...)"""
+    with pd.ExcelWriter(path) as writer:
+        for i in range(months):
+            month = MONTHS[i % 12]
+            df = generate_support_log(rows_per_month, month=month, seed=seed + i, **kwargs)
+            df.to_excel(writer, sheet_name=month.capitalize(), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic support log.")
+    parser.add_argument("--rows", type=int, default=10_000, help="rows per month")
+    parser.add_argument("--merchants", type=int, default=500)
+    parser.add_argument("--sales-reps", type=int, default=None, help="default: the dashboard's sales list")
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--months", type=int, default=1, help="sheets in an .xlsx output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, required=True, help=".csv or .xlsx")
+    args = parser.parse_args(argv)
+
+    options = dict(merchants=args.merchants, sales_reps=args.sales_reps, weeks=args.weeks)
+    if args.out.suffix.lower() == ".xlsx":
+        generate_workbook(args.out, args.rows, args.months, seed=args.seed, **options)
+    else:
+        generate_support_log(args.rows, seed=args.seed, **options).to_csv(args.out, index=False)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Benchmark suite: times ingest, the week and sidebar filters and each metric's compute step on
+synthetic data of growing size, and compares the results with a JSON baseline.
+
+    python -m benchmarks.run                                  # 10k, 100k and 1M rows
+    python -m benchmarks.run --sizes 10000 --update-baseline  # record a baseline
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+Exits with status 1 when a stage is slower than the baseline by more than --tolerance.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generate import generate_support_log
+from data_loader import clear_caches, load_dataframe, load_workbook_sheets
+from dataset import build_dataset
+from metrics.count_cube import INDEXED_DIMENSIONS, CountCube, build_count_cube
+from metrics.metric1_total_questions import compute_total_questions
+from metrics.metric2_most_features import compute_most_features
+from metrics.metric3_feature_support_tier import compute_feature_support_tier
+from metrics.metric4_support_tier import compute_support_tier
+from metrics.metric5_top_sales_curiosity import compute_top_sales_curiosity
+from metrics.metric6_sales_support_tier import compute_sales_support_tier
+from metrics.metric7_week_comparison import compute_week_comparison
+from metrics.metric8_month_comparison import compute_month_comparison
+from partitions import PartitionLayout
+from row_index import RowIndex
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# Writing workbooks is slow, so the XLSX stages stop at this size
+XLSX_MAX_ROWS = 100_000
+# Differences below this many seconds are treated as noise
+NOISE_FLOOR = 0.005
+MONTH_SHEETS = 3
+
+
+class NamedBytes(io.BytesIO):
+    """In-memory file with a name, like a Streamlit upload"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def measure(run, setup=None, repeat=3):
+    """Best wall time of `repeat` runs; setup() runs untimed before each one"""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fresh(cube):
+    """Same counts without memoized roll-ups, so compute steps are timed cold"""
+    return CountCube(cube.counts, cube.dims)
+
+
+def bench_size(rows, repeat, xlsx_max_rows):
+    """Stage timings (seconds) for one dataset size"""
+    timings = {}
+    raw = generate_support_log(rows, merchants=max(50, rows // 200), seed=rows)
+    csv_file = NamedBytes(raw.to_csv(index=False).encode(), "support.csv")
+
+    timings["ingest_csv"] = measure(lambda: load_dataframe(csv_file), setup=clear_caches, repeat=repeat)
+
+    if rows <= xlsx_max_rows:
+        buffer = io.BytesIO()
+        per_sheet = rows // MONTH_SHEETS
+        sheet_names = []
+        with pd.ExcelWriter(buffer) as writer:
+            for i in range(MONTH_SHEETS):
+                name = f"Month {i + 1}"
+                raw.iloc[i * per_sheet:(i + 1) * per_sheet].to_excel(writer, sheet_name=name, index=False)
+                sheet_names.append(name)
+        xlsx_file = NamedBytes(buffer.getvalue(), "support.xlsx")
+        timings["ingest_xlsx"] = measure(lambda: load_dataframe(xlsx_file), setup=clear_caches, repeat=repeat)
+        timings["ingest_xlsx_sheets"] = measure(
+            lambda: load_workbook_sheets(xlsx_file, sheet_names), setup=clear_caches, repeat=repeat
+        )
+
+    df_raw = load_dataframe(csv_file)
+    timings["prepare_dataset"] = measure(lambda: build_dataset(df_raw, "bench"), repeat=repeat)
+    dataset = build_dataset(df_raw, "bench")
+    df, cube = dataset.df, dataset.cube
+
+    timings["partition_layout"] = measure(lambda: PartitionLayout(df), repeat=repeat)
+    timings["build_row_index"] = measure(lambda: RowIndex(cube.counts, INDEXED_DIMENSIONS), repeat=repeat)
+
+    def week_filter():
+        # Same work as the dashboard's sidebar week filter
+        cube.filter(cube.counts["Week_Number"].eq(1).fillna(False))
+    timings["week_filter"] = measure(week_filter, repeat=repeat)
+
+    sales = df["Sales"].cat.categories[:2].tolist()
+    tiers = df["IT Support Tier"].cat.categories[:1].tolist()
+    week = dataset.week_cube(1)
+    # The app builds a cube's row index once, on its first filter
+    week.where({"Sales": sales})
+
+    def sidebar_filters():
+        # Two sales reps and one tier in week 1, resolved from the week cube's row index
+        week.where({"Sales": sales, "IT Support Tier": tiers})
+    timings["sidebar_filters"] = measure(sidebar_filters, setup=week._subcubes.clear, repeat=repeat)
+
+    month_size = len(df) // MONTH_SHEETS
+    month_cubes = {
+        f"Month {i + 1}": build_count_cube(df.iloc[i * month_size:(i + 1) * month_size])
+        for i in range(MONTH_SHEETS)
+    }
+    computes = {
+        "compute_metric1": lambda: compute_total_questions(fresh(cube)),
+        "compute_metric2": lambda: compute_most_features(fresh(cube), "Highest to Lowest"),
+        "compute_metric3": lambda: compute_feature_support_tier(fresh(cube)),
+        "compute_metric4": lambda: compute_support_tier(fresh(cube), "Highest to Lowest"),
+        "compute_metric5": lambda: compute_top_sales_curiosity(fresh(cube), "Highest to Lowest"),
+        "compute_metric6": lambda: compute_sales_support_tier(fresh(cube), "Highest to Lowest"),
+        "compute_metric7": lambda: compute_week_comparison(fresh(cube)),
+        "compute_metric8": lambda: compute_month_comparison({k: fresh(c) for k, c in month_cubes.items()}),
+    }
+    for stage, run in computes.items():
+        timings[stage] = measure(run, repeat=repeat)
+    return timings
+
+
+def compare(results, baseline, tolerance):
+    """(size, stage, baseline seconds, current seconds) for every stage that got slower"""
+    regressions = []
+    for size, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if before is not None and seconds > before * (1 + tolerance) and seconds - before > NOISE_FLOOR:
+                regressions.append((size, stage, before, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest, filtering and metric computation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="rows per dataset")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best is kept")
+    parser.add_argument("--xlsx-max-rows", type=int, default=XLSX_MAX_ROWS)
+    parser.add_argument("--out", type=Path, default=None, help="also write this run's results here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="save this run as the baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for rows in args.sizes:
+        print(f"{rows:>9,} rows")
+        results[str(rows)] = bench_size(rows, args.repeat, args.xlsx_max_rows)
+        for stage, seconds in results[str(rows)].items():
+            print(f"    {stage:<20} {seconds * 1000:10.1f} ms")
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    status = 0
+    if args.baseline.exists() and not args.update_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for size, stage, before, seconds in regressions:
+            print(f"❌ {stage} at {int(size):,} rows: {before * 1000:.1f} ms -> {seconds * 1000:.1f} ms")
+        if regressions:
+            status = 1
+        else:
+            print(f"✅ No stage slower than {args.baseline} by more than {args.tolerance:.0%}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
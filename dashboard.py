@@ -1,7 +1,7 @@
 import streamlit as st
+import os
+import uuid
 import pandas as pd
-from pathlib import Path
-import re
 from datetime import datetime
 from styles import load_css
 from metrics.metric1_total_questions import show_total_questions
@@ -12,6 +12,19 @@ from metrics.metric5_top_sales_curiosity import show_top_sales_curiosity
 from metrics.metric6_sales_support_tier import show_sales_support_tier
 from metrics.metric7_week_comparison import show_week_comparison
 from metrics.metric8_month_comparison import show_month_comparison
+from metrics.chart_utils import DEFAULT_TOP_N, TOP_N_OPTIONS
+from data_loader import combine_periods, content_fingerprint, load_dataframe, load_uploads, file_fingerprint, find_week_column
+from dataset import get_dataset, has_dataset
+from history_store import HISTORY_ENABLED, guess_month_label, history_store, history_view
+from google_sheets import SHEET_POLL_INTERVAL, InvalidSheetUrl, fetch_sheet, parse_sheet_url, refresh_sheet, watch_sheet
+from instrumentation import stage, start_profile, stop_profile, stop_memory_tracing
+
+# Append every profiled rerun's stage timings (JSON lines) to this file when set
+PROFILE_LOG = os.environ.get("DASHBOARD_PROFILE_LOG")
+# Profiled reruns kept per session for the JSON lines download
+PROFILE_HISTORY = 50
+# Dimensions offered as sidebar filters
+FILTER_DIMENSIONS = ['Merchants', 'Sales', 'Features Category', 'IT Support Tier']
 
 # Page configuration
 st.set_page_config(
@@ -23,26 +36,53 @@ st.set_page_config(
 # Load CSS styles
 load_css()
 
+# Record per-stage timings of this rerun when the sidebar debug panel is on. Memory
+# tracing is process-wide, so each session registers itself under its own id
+memory_tracer = st.session_state.setdefault("memory_tracer", uuid.uuid4().hex)
+profile = None
+if st.session_state.get("debug_stage_timings", False):
+    profile = start_profile(trace_memory=st.session_state.get("debug_trace_memory", True), tracer=memory_tracer)
+else:
+    stop_profile()
+
 # Dashboard title with icon
 st.markdown("<h1>Support Data Analytics Dashboard</h1>", unsafe_allow_html=True)
 
 # Data source selector
 data_source = st.radio(
     "Select Data Source",
-    ["📁 Upload File", "🌐 Google Sheet (Public URL)"],
+    ["📁 Upload File", "🌐 Google Sheet (Public URL)", "🗄️ Saved History"],
     horizontal=True
 )
 
 uploaded_file = None
+uploaded_files = []
 google_sheet_url = None
+history_months = []
 
 if data_source == "📁 Upload File":
-    # File uploader
-    uploaded_file = st.file_uploader(
-        "📁 Upload your Excel/CSV file",
+    # File uploader; several files (e.g. one per region or month) are combined into one dataset
+    uploaded_files = st.file_uploader(
+        "📁 Upload your Excel/CSV file(s)",
         type=["csv", "xlsx"],
-        help="Upload a CSV or Excel file containing your support data"
-    )
+        accept_multiple_files=True,
+        help="Upload a CSV or Excel file containing your support data. Select several files to analyze them together; each is tagged with a period named after the file."
+    ) or []
+    if len(uploaded_files) == 1:
+        uploaded_file = uploaded_files[0]
+elif data_source == "🗄️ Saved History":
+    # Months saved from earlier uploads and sheets; metrics are computed by SQL in the history store
+    saved_months = history_store().months()
+    if saved_months.empty:
+        st.info("💡 No saved months yet. Every file or Google Sheet you load is saved here by month.")
+    else:
+        history_months = st.multiselect(
+            "Months",
+            saved_months['month'].tolist(),
+            default=saved_months['month'].tolist(),
+            key="history_months",
+            help="Saved months to analyze together. Month Comparison shows each one side by side."
+        )
 else:
     # Google Sheet URL input
     google_sheet_url = st.text_input(
@@ -53,6 +93,7 @@ else:
     
     # Sheet selector for multiple sheets (appears after URL is entered)
     sheet_gid = None
+    background_refresh = False
     if google_sheet_url:
         st.info("💡 If your Google Sheet has multiple sheets (tabs), you can specify which one to load:")
         sheet_option = st.selectbox(
@@ -68,136 +109,31 @@ else:
                 help="The GID is in the URL when viewing a specific sheet: ...#gid=123456789. The first sheet is usually 0."
             )
             st.caption("📝 **How to find the GID:** Click on the sheet tab you want (e.g., 'February'), then look at the URL: `...#gid=123456789`. The number after `gid=` is what you need.")
+        
+        background_refresh = st.checkbox(
+            "Keep data updated in the background",
+            key="background_refresh",
+            help=f"Checks the sheet for changes every {SHEET_POLL_INTERVAL} seconds on the server, so reruns show the latest data without waiting for a download."
+        )
 
-if uploaded_file or google_sheet_url:
-    # Robust data loader for CSV/Excel
-    def load_dataframe(file):
-        filename = getattr(file, "name", "uploaded")
-        suffix = Path(filename).suffix.lower()
-
-        expected_cols = {"Week", "Merchants", "Sales"}
-
-        def clean_df(df_in: pd.DataFrame) -> pd.DataFrame:
-            df_out = df_in.copy()
-            # Normalize headers
-            df_out.columns = df_out.columns.astype(str).str.strip()
-            # Drop unnamed/empty columns
-            df_out = df_out.loc[:, ~df_out.columns.str.match(r"^Unnamed", na=False)]
-            # Drop fully empty rows
-            df_out = df_out.dropna(how="all")
-            # Convert dtypes more consistently
-            with pd.option_context("future.no_silent_downcasting", True):
-                df_out = df_out.convert_dtypes()
-            return df_out
-
-        if suffix == ".csv":
-            df0 = pd.read_csv(file)
-            return clean_df(df0)
-
-        # Excel handling (multiple sheets, header auto-detection)
-        try:
-            xls = pd.ExcelFile(file, engine="openpyxl")
-        except Exception:
-            xls = pd.ExcelFile(file)
-
-        best_df = None
-        best_score = -1
-        for sheet in xls.sheet_names:
-            # First try with default header
-            try:
-                df_default = pd.read_excel(xls, sheet_name=sheet)
-                df_default = clean_df(df_default)
-            except Exception:
-                df_default = pd.DataFrame()
-
-            needs_scan = (
-                df_default.empty
-                or (df_default.columns.str.match(r"^Unnamed").sum() > len(df_default.columns) // 2)
-                or (expected_cols.intersection(set(df_default.columns)) == set())
-            )
-
-            candidate_dfs = []
-            if not df_default.empty:
-                candidate_dfs.append(df_default)
-
-            if needs_scan:
-                try:
-                    raw = pd.read_excel(xls, sheet_name=sheet, header=None)
-                    # Scan first 15 rows to find header row containing expected columns
-                    header_row = None
-                    for i in range(min(15, len(raw))):
-                        row_vals = raw.iloc[i].astype(str).str.strip().tolist()
-                        overlap = expected_cols.intersection(set(row_vals))
-                        if len(overlap) >= 2 or ("Week" in row_vals):
-                            header_row = i
-                            break
-                    if header_row is not None:
-                        df_scan = raw.iloc[header_row + 1:].copy()
-                        headers = raw.iloc[header_row].astype(str).str.strip()
-                        df_scan.columns = headers
-                        df_scan = clean_df(df_scan)
-                        if not df_scan.empty:
-                            candidate_dfs.append(df_scan)
-                except Exception:
-                    pass
-
-            # Score candidates: prefer those covering expected columns and having more rows
-            for cdf in candidate_dfs:
-                score = 0
-                score += len(expected_cols.intersection(set(cdf.columns))) * 10
-                score += max(0, len(cdf))
-                # Penalize too few columns
-                score -= 5 if cdf.shape[1] < 2 else 0
-                if score > best_score:
-                    best_score = score
-                    best_df = cdf
-
-        if best_df is None:
-            # Final fallback: read first sheet
-            df_fallback = pd.read_excel(xls, sheet_name=0)
-            return clean_df(df_fallback)
-
-        return best_df
-
-    # Function to load data from Google Sheets
-    @st.cache_data(ttl=60)  # Cache for 60 seconds
-    def load_google_sheet(url, gid=None):
+if uploaded_files or google_sheet_url or history_months:
+    # Function to load data from Google Sheets (downloads are cached in google_sheets)
+    def load_google_sheet(url, gid=None, background=False):
         try:
             # Extract the sheet ID from the URL
-            match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
-            if not match:
-                st.error("❌ Invalid Google Sheets URL. Please check the URL and try again.")
-                return None
-
-            sheet_id = match.group(1)
+            sheet_id, url_gid = parse_sheet_url(url)
 
             # If the user pasted a URL with a gid but left the selector on "First Sheet",
             # honor the gid from the URL instead of silently defaulting to the doc's first sheet.
-            sheet_gid = gid
-            if sheet_gid is None:
-                gid_match = re.search(r'(?:[?&#])gid=(\d+)', url)
-                if gid_match:
-                    sheet_gid = gid_match.group(1)
-
-            # Construct the CSV export URL for public sheets
-            if sheet_gid:
-                csv_export_url = f'https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={sheet_gid}'
-            else:
-                csv_export_url = f'https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv'
-
-            # Try to read the data
-            df = pd.read_csv(csv_export_url)
-
-            # Clean the dataframe
-            df.columns = df.columns.astype(str).str.strip()
-            df = df.loc[:, ~df.columns.str.match(r"^Unnamed", na=False)]
-            df = df.dropna(how="all")
+            sheet_gid = gid if gid is not None else url_gid
 
-            with pd.option_context("future.no_silent_downcasting", True):
-                df = df.convert_dtypes()
-
-            return df
+            if background:
+                watch_sheet(sheet_id, gid=sheet_gid)
+            return fetch_sheet(sheet_id, gid=sheet_gid)
 
+        except InvalidSheetUrl:
+            st.error("❌ Invalid Google Sheets URL. Please check the URL and try again.")
+            return None
         except Exception as e:
             st.error(f"❌ Error loading Google Sheet: {str(e)}")
             st.info("💡 Make sure the Google Sheet is set to 'Anyone with the link can view'")
@@ -206,12 +142,33 @@ if uploaded_file or google_sheet_url:
             return None
 
     # Load data based on source
-    if uploaded_file:
-        df = load_dataframe(uploaded_file)
+    base_key, new_rows, dataset, load_rows = None, None, None, None
+    if history_months:
+        with stage("open history"):
+            dataset = history_view(history_months)
+        dataset_key = dataset.fingerprint
+    elif len(uploaded_files) > 1:
+        with stage("load files"):
+            file_keys = [f"{file.name}={file_fingerprint(file)}" for file in uploaded_files]
+            dataset_key = content_fingerprint("|".join(file_keys).encode())
+            # Files are parsed in parallel and concatenated with a Period column per file
+            load_rows = lambda: combine_periods(load_uploads(uploaded_files))
+            df = None if has_dataset(dataset_key) else load_rows()
+    elif uploaded_file:
+        with stage("load file"):
+            dataset_key = file_fingerprint(uploaded_file)
+            load_rows = lambda: load_dataframe(uploaded_file)
+            # Files ingested before (in memory or as a snapshot on disk) are not parsed again
+            df = None if has_dataset(dataset_key) else load_rows()
     else:
-        df = load_google_sheet(google_sheet_url, gid=sheet_gid)
+        with stage("fetch Google Sheet"):
+            sheet_version = load_google_sheet(google_sheet_url, gid=sheet_gid, background=background_refresh)
+        df, dataset_key = (sheet_version.df, sheet_version.fingerprint) if sheet_version else (None, None)
+        if sheet_version:
+            # Rows appended to the sheet are ingested on their own and folded into the previous aggregates
+            base_key, new_rows = sheet_version.base_fingerprint, sheet_version.new_rows
     
-    if df is None:
+    if dataset_key is None:
         st.stop()
     
     # Add manual refresh button for Google Sheets
@@ -219,39 +176,61 @@ if uploaded_file or google_sheet_url:
         col1, col2, col3 = st.columns([1, 2, 1])
         with col1:
             if st.button("🔄 Refresh Data", key="refresh_button", help="Manually refresh data from Google Sheet"):
-                st.cache_data.clear()  # Clear the cache
+                # Revalidate only this sheet; other sheets and their aggregates stay cached
+                sheet_id, url_gid = parse_sheet_url(google_sheet_url)
+                refresh_sheet(sheet_id, gid=sheet_gid if sheet_gid is not None else url_gid)
                 st.rerun()  # Rerun the app
         with col3:
-            st.caption(f"Last updated: {datetime.now().strftime('%H:%M:%S')}")
-    
-    # Clean column names
-    df.columns = df.columns.astype(str).str.strip()
+            # Time this version of the data was downloaded, not the time of this render
+            st.caption(f"Last updated: {datetime.fromtimestamp(sheet_version.fetched_at).strftime('%H:%M:%S')}")
     
-    # Filter out rows with empty critical columns (Merchants, Sales, Issue)
-    critical_cols = ['Merchants', 'Sales', 'Issue']
-    existing_critical = [col for col in critical_cols if col in df.columns]
-    if existing_critical:
-        # Keep rows where at least one critical column has a non-empty value
-        mask = df[existing_critical].notna().any(axis=1) & (df[existing_critical].astype(str).replace('', pd.NA).notna().any(axis=1))
-        df = df[mask]
-
-    # Store the full unfiltered dataframe for Week Comparison
-    df_full = df.copy()
+    # Ingest once per loaded dataset: drop empty rows, parse week numbers, encode
+    # dimensions and aggregate into the count cube that the metric pages read roll-ups from
+    if dataset is None:
+        dataset = get_dataset(df, dataset_key, base_fingerprint=base_key, new_rows=new_rows)
+        if dataset is None:
+            # The snapshot could not be read after all (corrupt or pruned meanwhile): parse the upload(s)
+            with stage("load file"):
+                df = load_rows()
+            dataset = get_dataset(df, dataset_key)
+        
+        # Every loaded month's counts are appended to the local history store
+        if HISTORY_ENABLED:
+            source_name = ", ".join(file.name for file in uploaded_files) or google_sheet_url
+            if dataset.periods:
+                # Files loaded together: one month per file, named after it
+                months_to_save = {period: (f"{dataset_key}:{period}", dataset.period_cube(period)) for period in dataset.periods}
+                st.caption(f"🗄️ Saved to history as {', '.join(months_to_save)}")
+            else:
+                month_label = st.text_input(
+                    "🗄️ Saved to history as",
+                    value=guess_month_label(dataset.cube, dataset.week_col, fallback=datetime.now().strftime("%Y-%m")),
+                    key=f"history_month_{dataset_key}",
+                    help="Month this data is kept under in Saved History; saving a month again replaces it"
+                )
+                months_to_save = {month_label: (dataset_key, dataset.cube)} if month_label else {}
+            # Written once per dataset and label; a renamed month is moved rather than kept twice
+            saved_labels = st.session_state.setdefault("history_saved", {})
+            for month, (fingerprint, month_cube) in months_to_save.items():
+                previous = saved_labels.get(fingerprint)
+                if previous == month:
+                    continue
+                if previous is not None:
+                    history_store().remove(previous, fingerprint=fingerprint)
+                if history_store().add(month, fingerprint, month_cube, source=source_name):
+                    st.toast(f"Saved {month} to history")
+                saved_labels[fingerprint] = month
+    # Week Comparison reads the whole, unfiltered dataset
+    df, cube_full = dataset.df, dataset.cube
+    memory_before, memory_after = dataset.memory_before, dataset.memory_after
 
     # Week filter (Whole Month or dynamically detected weeks)
-    week_col = 'Week' if 'Week' in df.columns else df.columns[0]
+    week_col = find_week_column(df)
     
-    # Detect available weeks in the data
-    available_weeks = set()
-    if week_col:
-        week_series = df[week_col].astype(str)
-        # Extract all week numbers (handles W1, W2, Week 1, 1, etc.)
-        import re as regex_module
-        for val in week_series.unique():
-            match = regex_module.search(r'[Ww]?(\d+)', val)
-            if match:
-                week_num = int(match.group(1))
-                available_weeks.add(week_num)
+    # Weeks found at ingest (handles W1, W2, Week 1, 1, etc.)
+    available_weeks = []
+    if cube_full.has('Week_Number'):
+        available_weeks = cube_full.rollup(['Week_Number']).index.tolist()
     
     # Build dynamic week options
     week_options = [f"Week {i}" for i in sorted(available_weeks)] + ["Whole Month"]
@@ -262,15 +241,29 @@ if uploaded_file or google_sheet_url:
         help="Filter rows where the week column contains week numbers. Choose Whole Month to see all."
     )
     
-    # Apply week filter only for non-comparison sections
-    df_filtered = df.copy()
+    # Narrow down to chosen merchants, sales, features or tiers; several values in
+    # one filter match any of them, and all filters must match
+    filters = {}
+    with st.sidebar.expander("🔎 Filters"):
+        for dim in FILTER_DIMENSIONS:
+            if not cube_full.has(dim):
+                continue
+            options = cube_full.rollup([dim]).index.tolist()
+            key = f"filter_{dim}"
+            # A different dataset may not have the values picked before
+            if key in st.session_state:
+                st.session_state[key] = [value for value in st.session_state[key] if value in options]
+            filters[dim] = st.multiselect(dim, options, key=key, placeholder="All")
+    
+    # Apply week and sidebar filters only for non-comparison sections; each slice is
+    # kept with the dataset, so metric results computed for it are reused on later reruns
+    week_number = None
     if week_filter != "Whole Month" and week_col:
-        key = week_filter.split()[-1]  # "1".."4"
-        week_series = df_filtered[week_col].astype(str)
-        week_mask = week_series.str.contains(fr"W\s*{key}", case=False, na=False) | week_series.str.fullmatch(key)
-        df_filtered = df_filtered[week_mask]
-    if df_filtered.empty:
-        st.warning("No data for the selected week filter.")
+        week_number = int(week_filter.split()[-1])  # "1".."4"
+    with stage("week filter"):
+        cube_filtered = dataset.week_view(week_number, filters)
+    if cube_filtered.empty:
+        st.warning("No data for the selected filters.")
         st.stop()
     
     st.sidebar.markdown("---")
@@ -291,6 +284,15 @@ if uploaded_file or google_sheet_url:
         label_visibility="collapsed"
     )
     
+    # Bars and pie slices beyond this are summed into "Other" to keep charts light
+    st.sidebar.select_slider(
+        "Categories per chart",
+        options=TOP_N_OPTIONS,
+        value=DEFAULT_TOP_N,
+        key="chart_top_n",
+        help="Charts show the largest categories and sum the rest into \"Other\""
+    )
+    
     st.sidebar.markdown("---")
     
     # Quick stats in sidebar
@@ -309,35 +311,77 @@ if uploaded_file or google_sheet_url:
             </p>
         </div>
         """.format(
-            len(df_filtered),
-            df_filtered['Merchants'].nunique() if 'Merchants' in df_filtered.columns else 'N/A',
-            df_filtered['Sales'].nunique() if 'Sales' in df_filtered.columns else 'N/A'
+            cube_filtered.total,
+            cube_filtered.nunique('Merchants') if cube_filtered.has('Merchants') else 'N/A',
+            cube_filtered.nunique('Sales') if cube_filtered.has('Sales') else 'N/A'
         ),
         unsafe_allow_html=True
     )
     
+    if memory_before:
+        st.sidebar.caption(
+            f"🗜️ Dimension columns: {memory_before / 1e6:.1f} MB → {memory_after / 1e6:.1f} MB "
+            f"({memory_before / max(memory_after, 1):.0f}× smaller)"
+        )
+    
     st.sidebar.markdown(
         "<p style='color: #94a3b8; text-align: center; font-size: 0.8rem; margin-top: 1rem;'>💡 Tip: Click on chart legends for interactive filtering</p>",
         unsafe_allow_html=True
     )
     
+    debug_panel = st.sidebar.expander("🐞 Debug", expanded=profile is not None)
+    with debug_panel:
+        st.checkbox("Record stage timings", key="debug_stage_timings", help="Wall time and peak memory of each step of a rerun")
+        st.checkbox("Trace memory (slower)", value=True, key="debug_trace_memory")
+    if not st.session_state.get("debug_stage_timings") or not st.session_state.get("debug_trace_memory", True):
+        stop_memory_tracing(memory_tracer)
+    
     # Display selected section
-    if section == "📈 Overview & Metrics":
-        show_total_questions(df_filtered)
-    elif section == "🔥 Feature Analysis":
-        show_most_features(df_filtered)
-    elif section == "📊 Support Tier Overview":
-        show_feature_support_tier(df_filtered)
-    elif section == "🎨 Feature & Support Tier":
-        show_support_tier(df_filtered)
-    elif section == "⭐ Sales Performance":
-        show_top_sales_curiosity(df_filtered)
-    elif section == "👥 Sales & Support Tier":
-        show_sales_support_tier(df_filtered)
-    elif section == "⏰ Week Comparison":
-        show_week_comparison(df_full)
-    elif section == "🗓️ Month Comparison":
-        show_month_comparison(data_source, uploaded_file, google_sheet_url)
+    with stage(f"show {section}"):
+        if section == "📈 Overview & Metrics":
+            show_total_questions(cube=cube_filtered)
+        elif section == "🔥 Feature Analysis":
+            show_most_features(cube=cube_filtered)
+        elif section == "📊 Support Tier Overview":
+            show_feature_support_tier(cube=cube_filtered)
+        elif section == "🎨 Feature & Support Tier":
+            show_support_tier(cube=cube_filtered)
+        elif section == "⭐ Sales Performance":
+            show_top_sales_curiosity(cube=cube_filtered)
+        elif section == "👥 Sales & Support Tier":
+            show_sales_support_tier(cube=cube_filtered)
+        elif section == "⏰ Week Comparison":
+            show_week_comparison(df, cube=cube_full)
+        elif section == "🗓️ Month Comparison":
+            # Files uploaded together and saved months are compared period by period
+            period_cubes = {period: dataset.period_cube(period) for period in dataset.periods}
+            show_month_comparison(data_source, uploaded_file, google_sheet_url, period_cubes=period_cubes)
+    
+    # Stage timings of this rerun
+    if profile is not None:
+        stop_profile()
+        profile.context.update(section=section, week_filter=week_filter)
+        jsonl = profile.to_jsonl()
+        history = st.session_state.setdefault("stage_timing_history", [])
+        history.append(jsonl)
+        del history[:-PROFILE_HISTORY]
+        if PROFILE_LOG:
+            with open(PROFILE_LOG, "a", encoding="utf-8") as log:
+                log.write(jsonl)
+        
+        with debug_panel:
+            timings = pd.DataFrame({
+                "Stage": ["· " * record["depth"] + record["stage"] for record in profile.records],
+                "ms": [round(record["seconds"] * 1000, 1) for record in profile.records],
+                "Peak MB": [round(record["peak_bytes"] / 1e6, 2) for record in profile.records]
+            })
+            st.dataframe(timings, hide_index=True, use_container_width=True)
+            st.download_button(
+                f"⬇️ Export {len(history)} rerun(s) as JSON lines",
+                "".join(history),
+                file_name="stage_timings.jsonl",
+                mime="application/json"
+            )
         
 else:
     # Welcome screen
@@ -0,0 +1,570 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from partitions import sort_partitions
+
+# Columns used to recognise the header row of a support sheet
+EXPECTED_COLS = {"Week", "Merchants", "Sales"}
+
+# Columns the dashboard actually reads; the streaming reader keeps only these
+DASHBOARD_COLUMNS = ["Week", "Merchants", "Sales", "Issue", "Features Category", "IT Support Tier"]
+
+# Week labels: JAN W1, W2, w2, Week 1, week 1, or just 1 (a W-prefixed number wins)
+WEEK_PATTERN = r"[Ww](?:eek)?\s*(\d+)"
+BARE_WEEK_PATTERN = r"(\d+)"
+
+# Rows need a value in at least one of these to count as a question
+CRITICAL_COLS = ["Merchants", "Sales", "Issue"]
+
+# Dimensions every metric groups by; dictionary-encoded at ingest
+CATEGORICAL_COLS = ["Merchants", "Sales", "Features Category", "IT Support Tier"]
+
+# Known features and sales people; the metric pages only chart these
+FEATURES_LIST = [
+    "Appointment", "Attendance", "Classroom", "E-Invoice", "Expenses", "General", "HARDWARE", "History", "Inventory", "Mall Integration", "Member", "Menu", "Message", "Online", "Booking", "Order", "Queue", "Receipt", "Report", "Roster", "Settings", "Shift", "Report", "SQL Integration", "Staff", "Tunai App", "Tunai Biz", "Tunai Staff", "Voucher", "Walk-in"
+]
+SALES_LIST = ["Danny", "Dylan", "Erica", "Hazwan", "Jun", "Kyle", "Old Sales", "Qis", "Raymond", "Tammy", "Tom"]
+# Case variants of these labels are merged under the listed spelling, so they stay on the lists
+PREFERRED_LABELS = {"Features Category": FEATURES_LIST, "Sales": SALES_LIST}
+
+# Number of prepared datasets kept in memory
+DATASET_CACHE_SIZE = 8
+
+# Workbooks at least this large are streamed instead of loaded whole
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+# Rows buffered per chunk while streaming
+STREAM_CHUNK_ROWS = 50_000
+
+# Several sheets of a workbook this large are parsed in worker processes
+PARALLEL_SHEETS_MIN_BYTES = 2 * 1024 * 1024
+SHEET_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping shared by every Streamlit session"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Streamlit upload id -> content fingerprint, so reruns skip re-hashing the bytes
+_upload_fingerprints = LRUCache(64)
+# Workbook fingerprint -> (winning sheet, header row) from the last header scan
+_header_choices = LRUCache(256)
+# (workbook fingerprint, sheet name) -> cleaned sheet, for month comparison
+_sheet_frames = LRUCache(64)
+# Workbook fingerprint -> sheet names
+_sheet_names = LRUCache(32)
+
+_sheet_pool = None
+_sheet_pool_lock = threading.Lock()
+
+
+def clean_df(df_in: pd.DataFrame) -> pd.DataFrame:
+    df_out = df_in.copy()
+    # Normalize headers
+    df_out.columns = df_out.columns.astype(str).str.strip()
+    # Drop unnamed/empty columns
+    df_out = df_out.loc[:, ~df_out.columns.str.match(r"^Unnamed", na=False)]
+    # Drop fully empty rows
+    df_out = df_out.dropna(how="all")
+    # Convert dtypes more consistently
+    with stage("convert_dtypes"), pd.option_context("future.no_silent_downcasting", True):
+        df_out = df_out.convert_dtypes()
+    return df_out
+
+
+def find_week_column(df: pd.DataFrame):
+    if "Week" in df.columns:
+        return "Week"
+    return df.columns[0] if len(df.columns) else None
+
+
+def parse_week_numbers(values: pd.Series) -> pd.Series:
+    """
+    Vectorized week number extraction (JAN W1 -> 1, Week 2 -> 2, 3 -> 3).
+    The regex only runs over the distinct labels, then is broadcast back to the rows.
+    """
+    codes, uniques = pd.factorize(values)
+    labels = pd.Series(uniques).astype("string")
+    digits = labels.str.extract(WEEK_PATTERN)[0].fillna(labels.str.extract(BARE_WEEK_PATTERN)[0])
+    unique_numbers = pd.to_numeric(digits).astype("Int64")
+    numbers = unique_numbers.array.take(codes, allow_fill=True)
+    return pd.Series(numbers, index=values.index, name="Week_Number")
+
+
+def encode_categorical(values: pd.Series, preferred=()) -> pd.Series:
+    """
+    Dictionary-encode a dimension column as a pandas Categorical.
+    Labels are stripped, spellings that differ only by case are merged under the
+    `preferred` spelling if there is one, else their most frequent form, and
+    categories are sorted so codes are stable for the same data.
+    """
+    codes, uniques = pd.factorize(values)
+    labels = pd.Series(uniques, dtype="string").str.strip()
+    keys = labels.str.casefold()
+    frequency = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    spellings = pd.DataFrame({"label": labels, "key": keys, "frequency": frequency})
+    spellings = spellings[spellings["label"] != ""]
+    canonical = (
+        spellings.sort_values("frequency", ascending=False, kind="stable")
+        .drop_duplicates("key")
+        .set_index("key")["label"]
+    )
+    if len(preferred):
+        preferred_spelling = {label.casefold(): label for label in preferred}
+        canonical = pd.Series(
+            [preferred_spelling.get(key, label) for key, label in canonical.items()], index=canonical.index, dtype="string"
+        )
+    categories = pd.Index(sorted(canonical.tolist()))
+
+    # Code per distinct raw value, with a trailing -1 so missing rows (code -1) stay missing
+    unique_codes = np.append(categories.get_indexer(keys.map(canonical)), -1)
+    categorical = pd.Categorical.from_codes(unique_codes[codes], categories=categories)
+    return pd.Series(categorical, index=values.index, name=values.name)
+
+
+def dimension_memory_usage(df: pd.DataFrame) -> int:
+    """Bytes held by the dimension columns"""
+    cols = [col for col in CATEGORICAL_COLS if col in df.columns]
+    return int(df[cols].memory_usage(deep=True, index=False).sum()) if cols else 0
+
+
+def prepare_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ingest step run once per loaded dataset: normalize headers, drop rows with
+    no critical values, add an integer Week_Number column, dictionary-encode
+    the dimension columns and order the rows by period and week.
+    """
+    # Clean column names
+    df = df.rename(columns=lambda col: str(col).strip())
+
+    # Filter out rows with empty critical columns (Merchants, Sales, Issue)
+    existing_critical = [col for col in CRITICAL_COLS if col in df.columns]
+    if existing_critical:
+        with stage("critical-column mask"):
+            # Keep rows where at least one critical column has a non-empty value
+            mask = df[existing_critical].notna().any(axis=1) & (df[existing_critical].astype(str).replace('', pd.NA).notna().any(axis=1))
+            df = df[mask]
+
+    derived = {}
+    week_col = find_week_column(df)
+    if week_col is not None:
+        with stage("parse week numbers"):
+            derived["Week_Number"] = parse_week_numbers(df[week_col])
+    with stage("encode dimensions"):
+        for col in CATEGORICAL_COLS:
+            if col in df.columns:
+                derived[col] = encode_categorical(df[col], preferred=PREFERRED_LABELS.get(col, ()))
+    with stage("partition rows"):
+        return sort_partitions(df.assign(**derived))
+
+
+def align_categories(base: pd.Series, new: pd.Series):
+    """
+    Give two encoded dimension columns one shared, sorted category list. Labels in
+    `new` that only differ by case from an existing label are folded into it.
+    """
+    existing = {label.casefold(): label for label in base.cat.categories}
+    new_labels = [existing.get(label.casefold(), label) for label in new.cat.categories]
+    categories = pd.Index(sorted(set(base.cat.categories).union(new_labels)))
+
+    unique_codes = np.append(categories.get_indexer(new_labels), -1)
+    new_aligned = pd.Categorical.from_codes(unique_codes[new.cat.codes.to_numpy()], categories=categories)
+    return (
+        base.cat.set_categories(categories),
+        pd.Series(new_aligned, index=new.index, name=new.name)
+    )
+
+
+def append_prepared(prepared: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Run the ingest step on appended rows only and add them to an already prepared dataset"""
+    tail = prepare_dataset(new_rows)
+    prepared = prepared.copy(deep=False)
+    for col in CATEGORICAL_COLS:
+        if col in prepared.columns and col in tail.columns:
+            prepared[col], tail[col] = align_categories(prepared[col], tail[col])
+    return pd.concat([prepared, tail], ignore_index=True)
+
+
+def read_file_bytes(file) -> bytes:
+    """Raw bytes of an uploaded file, file-like object or path"""
+    if isinstance(file, (str, Path)):
+        return Path(file).read_bytes()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    position = file.tell()
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+def content_fingerprint(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_fingerprint(file) -> str:
+    """Content hash identifying a loaded file across reruns and sessions"""
+    upload_id = getattr(file, "file_id", None)
+    if upload_id is not None:
+        fingerprint = _upload_fingerprints.get(upload_id)
+        if fingerprint is not None:
+            return fingerprint
+
+    fingerprint = content_fingerprint(read_file_bytes(file))
+    if upload_id is not None:
+        _upload_fingerprints.put(upload_id, fingerprint)
+    return fingerprint
+
+
+def is_large_workbook(file) -> bool:
+    size = getattr(file, "size", None)
+    if size is None:
+        size = len(read_file_bytes(file))
+    return size >= STREAMING_THRESHOLD_BYTES
+
+
+def upload_parse_options(file, streaming=None) -> tuple:
+    """(fingerprint, suffix, streaming): how load_dataframe parses an upload"""
+    filename = getattr(file, "name", None) or str(file)
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".csv":
+        streaming = False
+    elif streaming is None:
+        streaming = is_large_workbook(file)
+    return file_fingerprint(file), suffix, streaming
+
+
+def load_dataframe(file, streaming=None) -> pd.DataFrame:
+    """
+    Load a CSV/XLSX upload into a cleaned dataframe.
+    The raw frame is not cached: callers keep what they derive from it (the prepared
+    Dataset, a month's count cube) under the file's content fingerprint and only call
+    this when that is missing, so reruns with the same upload never touch the parser again.
+
+    streaming: stream XLSX rows keeping only DASHBOARD_COLUMNS. None decides by file size.
+    """
+    fingerprint, suffix, streaming = upload_parse_options(file, streaming)
+    df = None
+    with stage("parse file"):
+        if streaming:
+            df = read_xlsx_projected(io.BytesIO(read_file_bytes(file)))
+        if df is None:
+            df = parse_dataframe(io.BytesIO(read_file_bytes(file)), suffix, fingerprint=fingerprint)
+    return df
+
+
+def clear_caches():
+    """Forget cached fingerprints, header scans and sheets, e.g. to time cold loads"""
+    for cache in (_upload_fingerprints, _header_choices, _sheet_frames, _sheet_names):
+        cache.clear()
+
+
+def workbook_sheet_names(file) -> list:
+    """Sheet names of an uploaded workbook, cached by content fingerprint"""
+    fingerprint = file_fingerprint(file)
+    names = _sheet_names.get(fingerprint)
+    if names is None:
+        with pd.ExcelFile(io.BytesIO(read_file_bytes(file))) as xls:
+            names = list(xls.sheet_names)
+        _sheet_names.put(fingerprint, names)
+    return names
+
+
+def parse_sheet(data: bytes, sheet_name) -> pd.DataFrame:
+    """Parse and clean one sheet of a workbook held in memory; runs in worker processes"""
+    # Very large workbooks are streamed, keeping only the dashboard columns
+    if len(data) >= STREAMING_THRESHOLD_BYTES:
+        df = read_xlsx_projected(io.BytesIO(data), sheet_name=sheet_name)
+        if df is not None:
+            return df
+    return clean_df(pd.read_excel(io.BytesIO(data), sheet_name=sheet_name))
+
+
+def _sheet_executor():
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is None:
+            # Spawned workers: forking the multi-threaded Streamlit server is not safe
+            _sheet_pool = ProcessPoolExecutor(max_workers=SHEET_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _sheet_pool
+
+
+def load_workbook_sheets(file, sheet_names) -> dict:
+    """
+    Cleaned frames for several sheets of an uploaded workbook, by sheet name.
+    Sheets are cached per (workbook fingerprint, sheet), so any later selection of
+    already parsed sheets is a lookup. Sheets not cached yet are parsed in parallel
+    worker processes when the workbook is large. The frames are shared; don't modify them in place.
+    """
+    fingerprint = file_fingerprint(file)
+    frames = {name: _sheet_frames.get((fingerprint, name)) for name in sheet_names}
+    missing = [name for name, df in frames.items() if df is None]
+    if missing:
+        data = read_file_bytes(file)
+        if len(missing) > 1 and SHEET_WORKERS > 1 and len(data) >= PARALLEL_SHEETS_MIN_BYTES:
+            parsed = list(_sheet_executor().map(parse_sheet, [data] * len(missing), missing))
+        else:
+            parsed = [parse_sheet(data, name) for name in missing]
+        for name, df in zip(missing, parsed):
+            _sheet_frames.put((fingerprint, name), df)
+            frames[name] = df
+    return frames
+
+
+def parse_upload(data: bytes, name: str) -> pd.DataFrame:
+    """Parse and clean one uploaded file from its bytes; runs in worker processes"""
+    file = io.BytesIO(data)
+    file.name = name
+    return load_dataframe(file)
+
+
+def period_label(name: str) -> str:
+    """Period an uploaded file stands for, from its name (north_jan.xlsx -> north_jan)"""
+    return Path(name).stem
+
+
+def load_uploads(files) -> dict:
+    """
+    Cleaned frames for several uploads, keyed by period label in upload order.
+    Like load_dataframe, nothing is cached here; large uploads are parsed in
+    parallel worker processes.
+    """
+    data = [read_file_bytes(file) for file in files]
+    names = [getattr(file, "name", None) or str(file) for file in files]
+    with stage("parse files"):
+        if len(files) > 1 and SHEET_WORKERS > 1 and sum(map(len, data)) >= PARALLEL_SHEETS_MIN_BYTES:
+            parsed = list(_sheet_executor().map(parse_upload, data, names))
+        else:
+            parsed = [parse_upload(d, name) for d, name in zip(data, names)]
+
+    result = {}
+    for file, df in zip(files, parsed):
+        label = period_label(getattr(file, "name", None) or str(file))
+        # Same name twice (e.g. from different folders): keep both
+        unique_label, n = label, 2
+        while unique_label in result:
+            unique_label, n = f"{label} ({n})", n + 1
+        result[unique_label] = df
+    return result
+
+
+def combine_periods(frames: dict) -> pd.DataFrame:
+    """
+    One frame from several periods' frames, with a Period column in their order.
+    Dimensions are encoded later over the combined rows, so every period shares
+    one set of categories.
+    """
+    lengths = [len(df) for df in frames.values()]
+    combined = pd.concat(list(frames.values()), ignore_index=True)
+    codes = np.repeat(np.arange(len(frames)), lengths)
+    combined["Period"] = pd.Categorical.from_codes(codes, categories=list(frames), ordered=True)
+    return combined
+
+
+def frame_from_grid(raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
+    """Use one row of a header=None grid as the header, like pd.read_excel(header=...) would"""
+    headers = []
+    seen = {}
+    for i, value in enumerate(raw.iloc[header_row].tolist()):
+        name = f"Unnamed: {i}" if pd.isna(value) else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+
+    df_out = raw.iloc[header_row + 1:].copy()
+    df_out.columns = headers
+    # The grid is object-typed because of the header rows; re-infer the data columns
+    return df_out.infer_objects()
+
+
+def find_header_row(raw: pd.DataFrame):
+    """Scan first 15 rows to find header row containing expected columns"""
+    for i in range(min(15, len(raw))):
+        row_vals = raw.iloc[i].astype(str).str.strip().tolist()
+        overlap = EXPECTED_COLS.intersection(set(row_vals))
+        if len(overlap) >= 2 or ("Week" in row_vals):
+            return i
+    return None
+
+
+def parse_dataframe(file, suffix: str, fingerprint: str = None) -> pd.DataFrame:
+    """Robust data loader for CSV/Excel"""
+    if suffix == ".csv":
+        df0 = pd.read_csv(file)
+        return clean_df(df0)
+
+    # Excel handling (multiple sheets, header auto-detection)
+    try:
+        xls = pd.ExcelFile(file, engine="openpyxl")
+    except Exception:
+        xls = pd.ExcelFile(file)
+
+    # Workbook seen before: only the winning sheet needs parsing
+    remembered = _header_choices.get(fingerprint) if fingerprint else None
+    if remembered is not None:
+        sheet, header_row = remembered
+        raw = pd.read_excel(xls, sheet_name=sheet, header=None)
+        return clean_df(frame_from_grid(raw, header_row))
+
+    # Parse every sheet exactly once into a raw grid; header detection happens in memory
+    raw_sheets = pd.read_excel(xls, sheet_name=None, header=None)
+
+    best_df = None
+    best_choice = None
+    best_score = -1
+    for sheet, raw in raw_sheets.items():
+        candidates = []
+
+        # First try with default header (the first non-blank row, as read_excel does)
+        non_blank = raw.notna().any(axis=1)
+        default_row = int(non_blank.values.argmax()) if non_blank.any() else None
+        df_default = pd.DataFrame()
+        if default_row is not None:
+            try:
+                df_default = clean_df(frame_from_grid(raw, default_row))
+            except Exception:
+                df_default = pd.DataFrame()
+        if not df_default.empty:
+            candidates.append((df_default, default_row))
+
+        needs_scan = (
+            df_default.empty
+            or (df_default.columns.str.match(r"^Unnamed").sum() > len(df_default.columns) // 2)
+            or (EXPECTED_COLS.intersection(set(df_default.columns)) == set())
+        )
+
+        if needs_scan:
+            try:
+                header_row = find_header_row(raw)
+                if header_row is not None and header_row != default_row:
+                    df_scan = clean_df(frame_from_grid(raw, header_row))
+                    if not df_scan.empty:
+                        candidates.append((df_scan, header_row))
+            except Exception:
+                pass
+
+        # Score candidates: prefer those covering expected columns and having more rows
+        for cdf, header_row in candidates:
+            score = 0
+            score += len(EXPECTED_COLS.intersection(set(cdf.columns))) * 10
+            score += max(0, len(cdf))
+            # Penalize too few columns
+            score -= 5 if cdf.shape[1] < 2 else 0
+            if score > best_score:
+                best_score = score
+                best_df = cdf
+                best_choice = (sheet, header_row)
+
+    if best_df is None:
+        # Final fallback: first sheet with its first non-blank row as header
+        raw = next(iter(raw_sheets.values()), pd.DataFrame())
+        non_blank = raw.notna().any(axis=1)
+        if not non_blank.any():
+            return pd.DataFrame()
+        return clean_df(frame_from_grid(raw, int(non_blank.values.argmax())))
+
+    if fingerprint:
+        _header_choices.put(fingerprint, best_choice)
+    return best_df
+
+
+def _projected_header(ws, columns):
+    """Find the header row in the first 15 rows of a sheet and where each projected column sits"""
+    for i, row in enumerate(ws.iter_rows(max_row=15, values_only=True)):
+        row_vals = ["" if value is None else str(value).strip() for value in row]
+        overlap = EXPECTED_COLS.intersection(row_vals)
+        if len(overlap) >= 2 or ("Week" in row_vals):
+            positions = {}
+            for position, name in enumerate(row_vals):
+                if name in columns and name not in positions:
+                    positions[name] = position
+            return i, positions
+    return None, {}
+
+
+def read_xlsx_projected(file, sheet_name=None, columns=DASHBOARD_COLUMNS, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Stream an XLSX sheet with openpyxl read_only/iter_rows, keeping only `columns`.
+    Rows are turned into frames every `chunk_rows`, so peak memory is bounded by the
+    projected columns rather than the whole sheet. With no sheet_name the sheet whose
+    header covers the most projected columns wins. Returns None if no header is found.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheets = [workbook[sheet_name]] if sheet_name is not None else workbook.worksheets
+
+        best = None
+        for ws in worksheets:
+            header_row, positions = _projected_header(ws, columns)
+            if header_row is None:
+                continue
+            score = (len(positions), ws.max_row or 0)
+            if best is None or score > best[0]:
+                best = (score, ws, header_row, positions)
+        if best is None:
+            return None
+
+        _, ws, header_row, positions = best
+        names = list(positions)
+        indices = [positions[name] for name in names]
+        last_col = max(indices) + 1
+
+        chunks = []
+        buffer = []
+        # iter_rows is 1-based; data starts on the row after the header
+        for row in ws.iter_rows(min_row=header_row + 2, max_col=last_col, values_only=True):
+            buffer.append([row[i] if i < len(row) else None for i in indices])
+            if len(buffer) >= chunk_rows:
+                chunks.append(pd.DataFrame(buffer, columns=names))
+                buffer = []
+        if buffer or not chunks:
+            chunks.append(pd.DataFrame(buffer, columns=names))
+    finally:
+        workbook.close()
+
+    return clean_df(pd.concat(chunks, ignore_index=True))
@@ -0,0 +1,184 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import pandas as pd
+
+from data_loader import (
+    DATASET_CACHE_SIZE,
+    LRUCache,
+    append_prepared,
+    dimension_memory_usage,
+    find_week_column,
+    prepare_dataset,
+)
+from instrumentation import stage
+from metrics.count_cube import INDEXED_DIMENSIONS, CountCube, build_count_cube, filter_key
+from partitions import PartitionLayout
+from row_index import RowIndex
+from snapshots import has_snapshot, read_snapshot, write_snapshot_in_background
+
+
+@dataclass(frozen=True, eq=False)
+class Dataset:
+    """
+    A prepared dataset and the aggregates derived from it, identified by its content
+    fingerprint. Rows are ordered by period and week at ingest, so week and period
+    views are slices of `df` over their partitions rather than filtered copies.
+    """
+    df: pd.DataFrame
+    cube: CountCube
+    fingerprint: str
+    memory_before: int
+    memory_after: int
+    # Week number -> cube for that week
+    _week_cubes: dict = field(default_factory=dict, repr=False)
+    # Period label -> cube for that period
+    _period_cubes: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def week_col(self):
+        return find_week_column(self.df)
+
+    @cached_property
+    def layout(self) -> PartitionLayout:
+        """Row ranges of every period and week, found on first use"""
+        return PartitionLayout(self.df)
+
+    @cached_property
+    def row_index(self) -> RowIndex:
+        """Row ids per dimension value, built the first time filtered rows are asked for"""
+        return RowIndex(self.df, INDEXED_DIMENSIONS)
+
+    def rows(self, period=None, week_number=None, filters=None) -> pd.DataFrame:
+        """
+        Rows of one period and/or week (None for all) that match the sidebar `filters`
+        ({dimension: values}). Unfiltered, these are slices of the partitions involved;
+        filtered, a take of the matching row ids within those partitions.
+        """
+        key = filter_key(filters)
+        if not key:
+            return self.layout.rows(self.df, period, week_number)
+        ids = self.row_index.rows(dict(key))
+        if period is not None or week_number is not None:
+            ids = self.layout.clip(ids, period, week_number)
+        return self.df.take(ids)
+
+    def week_cube(self, week_number=None) -> CountCube:
+        """Cube for one week, or the whole dataset for None, built once"""
+        if week_number is None:
+            return self.cube
+        cube = self._week_cubes.get(week_number)
+        if cube is None:
+            cube = self.cube.filter(self.cube.counts['Week_Number'].eq(week_number).fillna(False))
+            self._week_cubes[week_number] = cube
+        return cube
+
+    def week_view(self, week_number=None, filters=None) -> CountCube:
+        """
+        Cube for one week, or the whole dataset for None, narrowed by the sidebar
+        `filters`. Cubes are kept per week and filter combination, so roll-ups and
+        metric results memoized on them survive reruns. The metrics read only the
+        cube; matching rows are cut with rows() when something needs them.
+        """
+        return self.week_cube(week_number).where(filters or {})
+
+    @property
+    def periods(self) -> list:
+        """Period labels of files loaded together, in upload order; empty for a single file"""
+        if not self.cube.has('Period'):
+            return []
+        return list(self.df['Period'].cat.categories)
+
+    def period_cube(self, period) -> CountCube:
+        """Cube for one period, built once"""
+        cube = self._period_cubes.get(period)
+        if cube is None:
+            cube = self.cube.filter(self.cube.counts['Period'].eq(period).to_numpy())
+            self._period_cubes[period] = cube
+        return cube
+
+    def period_view(self, period):
+        """(rows, cube) for one period; the rows are a slice of `df`"""
+        return self.rows(period=period), self.period_cube(period)
+
+
+# Prepared datasets keyed by content fingerprint
+_datasets = LRUCache(DATASET_CACHE_SIZE)
+
+
+def build_dataset(df_raw: pd.DataFrame, fingerprint: str) -> Dataset:
+    """Full ingest: prepare every row and aggregate the count cube"""
+    df = prepare_dataset(df_raw)
+    return Dataset(
+        df=df,
+        cube=build_count_cube(df, week_col=find_week_column(df)),
+        fingerprint=fingerprint,
+        memory_before=dimension_memory_usage(df_raw),
+        memory_after=dimension_memory_usage(df)
+    )
+
+
+def extend_dataset(base: Dataset, new_rows: pd.DataFrame, fingerprint: str) -> Dataset:
+    """Incremental ingest: prepare only the appended rows and fold their counts into the base cube"""
+    df = append_prepared(base.df, new_rows)
+    tail = df.iloc[len(base.df):]
+    return Dataset(
+        df=df,
+        cube=base.cube.add(build_count_cube(tail, week_col=base.week_col)),
+        fingerprint=fingerprint,
+        memory_before=base.memory_before + dimension_memory_usage(new_rows),
+        memory_after=dimension_memory_usage(df)
+    )
+
+
+def dataset_from_snapshot(fingerprint: str):
+    """Dataset read back from its on-disk snapshot, or None"""
+    snapshot = read_snapshot(fingerprint)
+    if snapshot is None:
+        return None
+    df, counts, meta = snapshot
+    return Dataset(
+        df=df,
+        cube=CountCube(counts, meta["dims"]),
+        fingerprint=fingerprint,
+        memory_before=meta["memory_before"],
+        memory_after=meta["memory_after"]
+    )
+
+
+def save_snapshot(dataset: Dataset):
+    meta = {"dims": dataset.cube.dims, "memory_before": dataset.memory_before, "memory_after": dataset.memory_after}
+    write_snapshot_in_background(dataset.fingerprint, dataset.df, dataset.cube.counts, meta)
+
+
+def has_dataset(fingerprint: str) -> bool:
+    """True when get_dataset can return this fingerprint without the raw frame"""
+    return fingerprint in _datasets or has_snapshot(fingerprint)
+
+
+def get_dataset(df_raw: pd.DataFrame, fingerprint: str, base_fingerprint: str = None, new_rows: pd.DataFrame = None):
+    """
+    Prepared dataset for a loaded frame, cached by fingerprint in memory and as an
+    on-disk snapshot. When the data is known to be `base_fingerprint` plus `new_rows`
+    and the base is still cached, only the new rows are processed. `df_raw` may be
+    None when has_dataset(fingerprint) is true; if the snapshot then turns out to be
+    unreadable or was pruned meanwhile, None is returned and the caller has to load
+    the frame and call again.
+    """
+    dataset = _datasets.get(fingerprint)
+    if dataset is None:
+        with stage("read snapshot"):
+            dataset = dataset_from_snapshot(fingerprint)
+        if dataset is None:
+            base = _datasets.get(base_fingerprint) if base_fingerprint else None
+            if base is not None and new_rows is not None:
+                with stage("ingest appended rows"):
+                    dataset = extend_dataset(base, new_rows, fingerprint)
+            elif df_raw is None:
+                return None
+            else:
+                with stage("prepare dataset"):
+                    dataset = build_dataset(df_raw, fingerprint)
+            save_snapshot(dataset)
+        _datasets.put(fingerprint, dataset)
+    return dataset
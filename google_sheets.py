@@ -0,0 +1,348 @@
+import io
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+import pandas as pd
+
+from data_loader import LRUCache, clean_df, content_fingerprint
+
+# Export endpoint; point it at a local HTTP server serving CSV to test without Google
+GOOGLE_SHEETS_BASE_URL = os.environ.get("GOOGLE_SHEETS_BASE_URL", "https://docs.google.com/spreadsheets/d")
+
+# Seconds a fetched sheet is reused before it is revalidated
+SHEET_CACHE_TTL = 60
+# A manual refresh is ignored if the sheet was checked this recently (one click per crowd)
+REFRESH_COOLDOWN = 5
+# Seconds between background polls of watched sheets (kept below the TTL so reads never wait)
+SHEET_POLL_INTERVAL = int(os.environ.get("SHEET_POLL_INTERVAL", "30"))
+# Sheets nobody has viewed for this long are no longer polled
+WATCH_IDLE_TIMEOUT = 10 * 60
+# Concurrent sheet downloads
+FETCH_WORKERS = 4
+FETCH_TIMEOUT = 30
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidSheetUrl(ValueError):
+    pass
+
+
+@dataclass(frozen=True, eq=False)
+class SheetVersion:
+    """
+    One immutable version of a sheet. fetched_at is when this content was first
+    downloaded, checked_at when the server last confirmed it is current.
+    If the content is an earlier version with rows appended, base_fingerprint names
+    that version and new_rows holds only the appended rows.
+    """
+    df: pd.DataFrame
+    fingerprint: str
+    fetched_at: float
+    checked_at: float
+    etag: str = None
+    last_modified: str = None
+    raw_columns: tuple = ()
+    byte_length: int = 0
+    base_fingerprint: str = None
+    new_rows: pd.DataFrame = None
+
+
+def parse_sheet_url(url):
+    """Return (sheet_id, gid) from a Google Sheets URL; gid is None if the URL has none"""
+    match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
+    if not match:
+        raise InvalidSheetUrl(url)
+    gid_match = re.search(r'(?:[?&#])gid=(\d+)', url)
+    return match.group(1), gid_match.group(1) if gid_match else None
+
+
+def sheet_key(sheet_id, sheet_name=None, gid=None):
+    """Cache key for one sheet (tab) of a spreadsheet"""
+    return (sheet_id, sheet_name or None, str(gid) if gid else None)
+
+
+def export_url(sheet_id, sheet_name=None, gid=None):
+    """CSV export URL for a public sheet, by tab name, GID or the first tab"""
+    if sheet_name:
+        return f"{GOOGLE_SHEETS_BASE_URL}/{sheet_id}/gviz/tq?tqx=out:csv&sheet={quote(sheet_name)}"
+    if gid:
+        return f"{GOOGLE_SHEETS_BASE_URL}/{sheet_id}/export?format=csv&gid={gid}"
+    return f"{GOOGLE_SHEETS_BASE_URL}/{sheet_id}/export?format=csv"
+
+
+class SheetCache:
+    """
+    Downloaded sheets keyed by (sheet id, sheet name, gid) with a TTL.
+    Shared by the main view and month comparison, and by every session: only one
+    download per sheet runs at a time, concurrent callers wait for it. Expired or
+    invalidated entries are revalidated against the previous version, not dropped.
+    """
+
+    def __init__(self, ttl, max_entries=32):
+        self.ttl = ttl
+        self._versions = LRUCache(max_entries)
+        self._stale = set()
+        # Sheet key -> [download lock, holders and waiters]
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        version = self._versions.get(key)
+        with self._lock:
+            stale = key in self._stale
+        if version is not None and not stale and time.time() - version.checked_at < self.ttl:
+            return version
+        return None
+
+    @contextmanager
+    def _locked(self, key):
+        """Hold the download lock of one sheet. Locks exist only while someone holds or waits for them."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._key_locks.get(key) is entry:
+                    del self._key_locks[key]
+
+    def get(self, key, fetch):
+        version = self._fresh(key)
+        if version is not None:
+            return version
+        with self._locked(key):
+            # Another session may have finished the download while we waited
+            version = self._fresh(key)
+            if version is None:
+                version = fetch(self._versions.get(key))
+                self._versions.put(key, version)
+                with self._lock:
+                    self._stale.discard(key)
+            return version
+
+    def update(self, key, fetch):
+        """Fetch a new version now and swap it in; readers keep the old one until then"""
+        with self._locked(key):
+            version = fetch(self._versions.get(key))
+            self._versions.put(key, version)
+            with self._lock:
+                self._stale.discard(key)
+            return version
+
+    def invalidate(self, key):
+        """Revalidate one sheet on its next read, unless it was just checked"""
+        version = self._versions.get(key)
+        if version is not None and time.time() - version.checked_at < REFRESH_COOLDOWN:
+            return
+        with self._lock:
+            self._stale.add(key)
+
+    def clear(self):
+        self._versions.clear()
+        with self._lock:
+            self._stale.clear()
+            self._key_locks.clear()
+
+
+_sheet_cache = SheetCache(SHEET_CACHE_TTL)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _fetch_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="sheet-fetch")
+        return _executor
+
+
+def parse_appended_rows(data: bytes, previous: SheetVersion):
+    """
+    If `data` is the previous content with rows added at the end, parse just those
+    rows into a frame matching previous.df. Returns None when anything else changed.
+    """
+    if not previous.byte_length or len(data) <= previous.byte_length:
+        return None
+    # Same bytes up to the old length means the header and every earlier row are untouched
+    if content_fingerprint(data[:previous.byte_length]) != previous.fingerprint:
+        return None
+    tail = data[previous.byte_length:]
+    # The old last row must be complete, not extended in place
+    if not data[:previous.byte_length].endswith((b"\n", b"\r")) and not tail.startswith((b"\n", b"\r")):
+        return None
+
+    try:
+        rows = clean_df(pd.read_csv(io.BytesIO(tail.lstrip(b"\r\n")), header=None, names=list(previous.raw_columns)))
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError):
+        return None
+    if list(rows.columns) != list(previous.df.columns):
+        return None
+    # The tail alone may infer other dtypes; give it the existing schema or rebuild
+    for col, dtype in previous.df.dtypes.items():
+        if rows[col].dtype != dtype:
+            try:
+                rows[col] = rows[col].astype(dtype)
+            except (TypeError, ValueError):
+                return None
+    return rows
+
+
+def download_sheet(sheet_id, sheet_name=None, gid=None, previous: SheetVersion = None) -> SheetVersion:
+    """
+    Download and clean one sheet, bypassing the cache.
+    With a previous version the request is conditional (ETag/Last-Modified), and
+    unchanged content, by status or by hash, returns the previous frame unparsed.
+    Content that only gained rows at the end has just those rows parsed.
+    """
+    request = Request(export_url(sheet_id, sheet_name, gid))
+    if previous is not None:
+        if previous.etag:
+            request.add_header("If-None-Match", previous.etag)
+        if previous.last_modified:
+            request.add_header("If-Modified-Since", previous.last_modified)
+
+    try:
+        with urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except HTTPError as e:
+        if e.code == 304 and previous is not None:
+            return replace(previous, checked_at=time.time())
+        raise
+
+    now = time.time()
+    fingerprint = content_fingerprint(data)
+    if previous is not None and fingerprint == previous.fingerprint:
+        # Same bytes: keep the parsed frame and every aggregate keyed on its fingerprint
+        return replace(previous, checked_at=now, etag=etag, last_modified=last_modified)
+
+    new_rows = parse_appended_rows(data, previous) if previous is not None else None
+    if new_rows is not None:
+        return SheetVersion(
+            df=pd.concat([previous.df, new_rows], ignore_index=True),
+            fingerprint=fingerprint,
+            fetched_at=now,
+            checked_at=now,
+            etag=etag,
+            last_modified=last_modified,
+            raw_columns=previous.raw_columns,
+            byte_length=len(data),
+            base_fingerprint=previous.fingerprint,
+            new_rows=new_rows
+        )
+
+    raw = pd.read_csv(io.BytesIO(data))
+    return SheetVersion(
+        df=clean_df(raw),
+        fingerprint=fingerprint,
+        fetched_at=now,
+        checked_at=now,
+        etag=etag,
+        last_modified=last_modified,
+        raw_columns=tuple(raw.columns),
+        byte_length=len(data)
+    )
+
+
+def fetch_sheet(sheet_id, sheet_name=None, gid=None) -> SheetVersion:
+    """Cached download of one sheet"""
+    return _sheet_cache.get(
+        sheet_key(sheet_id, sheet_name, gid),
+        lambda previous: download_sheet(sheet_id, sheet_name, gid, previous=previous)
+    )
+
+
+def refresh_sheet(sheet_id, sheet_name=None, gid=None):
+    """Have the next read of this sheet check the server for changes; other sheets are untouched"""
+    _sheet_cache.invalidate(sheet_key(sheet_id, sheet_name, gid))
+
+
+def fetch_sheets(requests):
+    """
+    Fetch several sheets concurrently. `requests` holds (sheet_id, sheet_name, gid)
+    tuples; the result has a SheetVersion or the raised exception for each, in order.
+    """
+    futures = [_fetch_executor().submit(fetch_sheet, *request) for request in requests]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def clear_sheet_cache():
+    _sheet_cache.clear()
+
+
+class SheetPoller:
+    """
+    Daemon thread that revalidates watched sheets on a schedule, so downloads and
+    parsing happen off the script thread. Each poll swaps in a new immutable
+    SheetVersion; sessions pick it up on their next rerun.
+    """
+
+    def __init__(self, cache, interval):
+        self.cache = cache
+        self.interval = interval
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, sheet_id, sheet_name=None, gid=None):
+        """Keep polling this sheet; call on every rerun that shows it"""
+        with self._lock:
+            self._watched[(sheet_id, sheet_name, gid)] = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sheet-poller", daemon=True)
+                self._thread.start()
+
+    def _watched_sheets(self):
+        now = time.time()
+        with self._lock:
+            for request, last_seen in list(self._watched.items()):
+                if now - last_seen > WATCH_IDLE_TIMEOUT:
+                    del self._watched[request]
+            return list(self._watched)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            for sheet_id, sheet_name, gid in self._watched_sheets():
+                try:
+                    self.cache.update(
+                        sheet_key(sheet_id, sheet_name, gid),
+                        lambda previous: download_sheet(sheet_id, sheet_name, gid, previous=previous)
+                    )
+                except Exception:
+                    logger.exception("Background poll of sheet %s failed", sheet_id)
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def watch_sheet(sheet_id, sheet_name=None, gid=None):
+    """Poll this sheet in the background every SHEET_POLL_INTERVAL seconds"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = SheetPoller(_sheet_cache, SHEET_POLL_INTERVAL)
+    _poller.watch(sheet_id, sheet_name, gid)
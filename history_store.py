@@ -0,0 +1,290 @@
+"""
+Local history of loaded sheets, one entry per month, in an SQLite file. Each
+month's count cube is stored as rows of (week, merchant, sales, feature, tier,
+count); HistoryCube answers the same roll-ups as CountCube with SQL GROUP BYs,
+so a year of history is queried without loading it into every session.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from data_loader import LRUCache
+from metrics.count_cube import MAX_MEMOIZED, MAX_SUBCUBES, CountCube
+
+HISTORY_DB = Path(os.environ.get("DASHBOARD_HISTORY_DB", Path(__file__).parent / ".history" / "history.sqlite"))
+# Every loaded sheet is saved to the store unless DASHBOARD_HISTORY=0
+HISTORY_ENABLED = os.environ.get("DASHBOARD_HISTORY", "1") != "0"
+
+# Cube dimension -> column in the counts table
+DIM_COLUMNS = {
+    'Week': 'week',
+    'Week_Number': 'week_number',
+    'Merchants': 'merchant',
+    'Sales': 'sales',
+    'Features Category': 'feature',
+    'IT Support Tier': 'tier',
+    'Month': 'month',
+}
+
+# Whole month names or their abbreviations only, so "Market W1" is not March
+MONTH_PATTERN = re.compile(
+    r"\b(JAN(?:UARY)?|FEB(?:RUARY)?|MAR(?:CH)?|APR(?:IL)?|MAY|JUNE?|JULY?|AUG(?:UST)?"
+    r"|SEP(?:T|TEMBER)?|OCT(?:OBER)?|NOV(?:EMBER)?|DEC(?:EMBER)?)\b",
+    re.IGNORECASE
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    month TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    source TEXT,
+    questions INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (
+    month TEXT NOT NULL,
+    week TEXT,
+    week_number INTEGER,
+    merchant TEXT,
+    sales TEXT,
+    feature TEXT,
+    tier TEXT,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS counts_by_month ON counts (month, week_number);
+"""
+
+
+def guess_month_label(cube: CountCube, week_col, fallback: str) -> str:
+    """Month named in the week labels ("JAN W1" -> "Jan"), else `fallback`"""
+    if week_col is None or not cube.has(week_col):
+        return fallback
+    labels = cube.rollup([week_col])
+    found = labels.index.astype(str).str.extract(MONTH_PATTERN, expand=False).str[:3].str.capitalize()
+    votes = labels.groupby(found.to_numpy()).sum()
+    return votes.idxmax() if len(votes) else fallback
+
+
+class HistoryStore:
+    """SQLite file holding one count cube per month. Saving a month again replaces it."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = Path(path)
+        self._cubes = LRUCache(32)
+        self._schema_ready = False
+
+    def connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call: Streamlit runs sessions on different threads
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._schema_ready = True
+        return connection
+
+    def revision(self) -> int:
+        """Bumped on every write, so cached cubes notice new data"""
+        with closing(self.connect()) as connection:
+            return connection.execute("PRAGMA user_version").fetchone()[0]
+
+    def add(self, month: str, fingerprint: str, cube: CountCube, source: str = "") -> bool:
+        """Save a month's counts. Returns False when the month already holds this exact data."""
+        week_col = cube.dims[0] if cube.dims and cube.dims[0] not in DIM_COLUMNS else None
+        columns = {dim: DIM_COLUMNS.get(dim, 'week' if dim == week_col else None) for dim in cube.dims}
+        columns = {dim: column for dim, column in columns.items() if column is not None and column != 'month'}
+
+        rows = cube.counts[list(columns) + ['Count']].astype(object)
+        rows = rows.where(rows.notna(), None)
+        rows.insert(0, 'month', month)
+
+        with closing(self.connect()) as connection, connection:
+            current = connection.execute("SELECT fingerprint FROM months WHERE month = ?", (month,)).fetchone()
+            if current is not None and current[0] == fingerprint:
+                return False
+            connection.execute("DELETE FROM counts WHERE month = ?", (month,))
+            connection.executemany(
+                f"INSERT INTO counts (month, {', '.join(columns.values())}, count) "
+                f"VALUES ({', '.join('?' * (len(columns) + 2))})",
+                rows.itertuples(index=False, name=None)
+            )
+            connection.execute(
+                "INSERT INTO months (month, fingerprint, source, questions, added_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (month) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "source = excluded.source, questions = excluded.questions",
+                (month, fingerprint, source, cube.total, time.time())
+            )
+            connection.execute(f"PRAGMA user_version = {self._next_revision(connection)}")
+        return True
+
+    def remove(self, month: str, fingerprint: str = None):
+        """Delete a saved month; with `fingerprint`, only while it still holds that data"""
+        with closing(self.connect()) as connection, connection:
+            if fingerprint is not None:
+                current = connection.execute("SELECT fingerprint FROM months WHERE month = ?", (month,)).fetchone()
+                if current is None or current[0] != fingerprint:
+                    return
+            connection.execute("DELETE FROM counts WHERE month = ?", (month,))
+            connection.execute("DELETE FROM months WHERE month = ?", (month,))
+            connection.execute(f"PRAGMA user_version = {self._next_revision(connection)}")
+
+    @staticmethod
+    def _next_revision(connection) -> int:
+        return connection.execute("PRAGMA user_version").fetchone()[0] + 1
+
+    def months(self) -> pd.DataFrame:
+        """Saved months in the order they were first added"""
+        with closing(self.connect()) as connection:
+            return pd.read_sql_query(
+                "SELECT month, questions, source, added_at FROM months ORDER BY added_at", connection
+            )
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        with closing(self.connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def cube(self, months, week_number=None) -> "HistoryCube":
+        """Cube over the given months (and week), shared between reruns until the store changes"""
+        key = (self.revision(), tuple(months), week_number)
+        cube = self._cubes.get(key)
+        if cube is None:
+            cube = HistoryCube(self, months, week_number)
+            self._cubes.put(key, cube)
+        return cube
+
+
+class HistoryCube(CountCube):
+    """
+    CountCube over saved months. Roll-ups are SQL GROUP BYs run in the store and
+    memoized like CountCube's; `counts` is only loaded when something needs the
+    full combinations (e.g. filter()).
+    """
+
+    def __init__(self, store: HistoryStore, months, week_number=None):
+        self.store = store
+        self.months = tuple(months)
+        self.week_number = week_number
+        self._rollups = LRUCache(MAX_MEMOIZED)
+        self._pivots = LRUCache(MAX_MEMOIZED)
+        self._results = LRUCache(MAX_MEMOIZED)
+        self._subcubes = LRUCache(MAX_SUBCUBES)
+        self._row_index = None
+        self._row_index_lock = threading.Lock()
+        self._counts = None
+        self._total = None
+
+        where, params = self._where()
+        present = store.query(
+            "SELECT " + ", ".join(f"COUNT({column}) AS {column}" for column in DIM_COLUMNS.values())
+            + f" FROM counts WHERE {where}", params
+        ).iloc[0]
+        self.dims = [dim for dim, column in DIM_COLUMNS.items() if present[column] > 0]
+
+    def _where(self, dims=()):
+        clauses = [f"month IN ({', '.join('?' * len(self.months))})"]
+        params = list(self.months)
+        if self.week_number is not None:
+            clauses.append("week_number = ?")
+            params.append(int(self.week_number))
+        clauses += [f"{DIM_COLUMNS[dim]} IS NOT NULL" for dim in dims]
+        return " AND ".join(clauses), params
+
+    @property
+    def total(self) -> int:
+        if self._total is None:
+            where, params = self._where()
+            self._total = int(self.store.query(f"SELECT COALESCE(SUM(count), 0) AS total FROM counts WHERE {where}", params)['total'][0])
+        return self._total
+
+    def rollup(self, dims) -> pd.Series:
+        dims = list(dims)
+        key = tuple(dims)
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            for dim in dims:
+                if dim not in self.dims:
+                    raise KeyError(dim)
+            columns = [DIM_COLUMNS[dim] for dim in dims]
+            where, params = self._where(dims)
+            group = ", ".join(columns)
+            result = self.store.query(
+                f"SELECT {group}, SUM(count) AS Count FROM counts WHERE {where} GROUP BY {group} ORDER BY {group}", params
+            )
+            result.columns = dims + ['Count']
+            rollup = result.set_index(dims)['Count']
+            self._rollups.put(key, rollup)
+        return rollup.copy()
+
+    @property
+    def counts(self) -> pd.DataFrame:
+        if self._counts is None:
+            columns = [DIM_COLUMNS[dim] for dim in self.dims]
+            where, params = self._where()
+            group = ", ".join(columns)
+            counts = self.store.query(f"SELECT {group}, SUM(count) AS Count FROM counts WHERE {where} GROUP BY {group}", params)
+            counts.columns = self.dims + ['Count']
+            self._counts = counts
+        return self._counts
+
+    def week(self, week_number) -> "HistoryCube":
+        return self.store.cube(self.months, week_number)
+
+
+@dataclass(frozen=True, eq=False)
+class HistoryView:
+    """Dataset-like view of saved months for the dashboard; rows stay in the store"""
+    cube: HistoryCube
+    fingerprint: str
+    memory_before: int = 0
+    memory_after: int = 0
+    # Empty frame with the dimension columns, for code that inspects column names
+    df: pd.DataFrame = field(default=None, repr=False)
+
+    @property
+    def week_col(self):
+        return 'Week' if self.cube.has('Week') else None
+
+    def week_view(self, week_number=None, filters=None) -> HistoryCube:
+        """Cube for one week, or all selected months for None, narrowed by `filters`"""
+        cube = self.cube if week_number is None else self.cube.week(week_number)
+        return cube.where(filters or {})
+
+    @property
+    def periods(self) -> list:
+        return list(self.cube.months)
+
+    def period_cube(self, month) -> "HistoryCube":
+        return self.cube.store.cube([month])
+
+    def period_view(self, month):
+        return self.df, self.period_cube(month)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def history_store() -> HistoryStore:
+    """The process-wide store at HISTORY_DB"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
+
+
+def history_view(months) -> HistoryView:
+    store = history_store()
+    cube = store.cube(months)
+    return HistoryView(
+        cube=cube,
+        fingerprint=f"history:{store.revision()}:{'|'.join(cube.months)}",
+        df=pd.DataFrame(columns=cube.dims)
+    )
@@ -0,0 +1,134 @@
+"""
+Per-stage timing for dashboard reruns. Code marks stages with `with stage("name"):`;
+while a RerunProfile is active on the current thread (one Streamlit script run),
+each stage's wall time and peak traced memory are recorded. Without an active
+profile, stage() does nothing.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_local = threading.local()
+# Sessions that currently want tracemalloc on -> when they last asked; it is process-wide
+_memory_tracers = {}
+_memory_tracers_lock = threading.Lock()
+# A session that has not rerun for this many seconds (e.g. its tab was closed with
+# the debug panel on) no longer keeps tracing on; it registers again on its next rerun
+MEMORY_TRACER_TIMEOUT = 15 * 60
+
+
+class RerunProfile:
+    """
+    Stages recorded during one rerun, in the order they started. Peak memory is
+    the highest traced allocation above the stage's starting point, including its
+    child stages. tracemalloc is process-wide, so with several sessions profiling at
+    once the memory numbers are approximate.
+    """
+
+    def __init__(self, trace_memory=True, **context):
+        self.trace_memory = trace_memory
+        self.context = context
+        self.started_at = time.time()
+        self.records = []
+        self._stack = []
+
+    def _traced(self):
+        return tracemalloc.get_traced_memory() if self.trace_memory and tracemalloc.is_tracing() else (0, 0)
+
+    @contextmanager
+    def stage(self, name):
+        # Fold the parent's peak so far into its running maximum before resetting
+        current, peak = self._traced()
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        record = {"stage": name, "depth": len(self._stack), "seconds": 0.0, "peak_bytes": 0}
+        self.records.append(record)
+        frame = {"start_memory": current, "peak": current}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._stack.pop()
+            _, peak = self._traced()
+            peak = max(frame["peak"], peak)
+            record["peak_bytes"] = max(0, peak - frame["start_memory"])
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            if self.trace_memory and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+
+    def to_jsonl(self) -> str:
+        """One JSON object per stage, tagged with the rerun's start time and context"""
+        lines = []
+        for record in self.records:
+            line = {"rerun_started_at": self.started_at, **self.context, **record}
+            lines.append(json.dumps(line, default=str))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def start_profile(trace_memory=True, tracer=None, **context) -> RerunProfile:
+    """
+    Record stages on this thread until stop_profile(). With trace_memory, memory
+    tracing is kept on for `tracer` (e.g. a session id) until stop_memory_tracing(tracer),
+    or until it has not started a profile for MEMORY_TRACER_TIMEOUT seconds.
+    """
+    if trace_memory:
+        start_memory_tracing(tracer)
+    profile = RerunProfile(trace_memory=trace_memory, **context)
+    _local.profile = profile
+    return profile
+
+
+def stop_profile():
+    _local.profile = None
+
+
+def _expire_memory_tracers(now):
+    for tracer, last_seen in list(_memory_tracers.items()):
+        if now - last_seen > MEMORY_TRACER_TIMEOUT:
+            del _memory_tracers[tracer]
+
+
+def start_memory_tracing(tracer=None):
+    """Turn tracemalloc on and remember that `tracer` needs it"""
+    with _memory_tracers_lock:
+        now = time.monotonic()
+        _expire_memory_tracers(now)
+        _memory_tracers[tracer] = now
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def stop_memory_tracing(tracer=None):
+    """
+    `tracer` no longer needs tracemalloc. It is stopped once no other session is
+    tracing, since it slows every allocation in the process.
+    """
+    with _memory_tracers_lock:
+        _memory_tracers.pop(tracer, None)
+        _expire_memory_tracers(time.monotonic())
+        if not _memory_tracers and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def current_profile():
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def stage(name):
+    """Record a stage on the active profile; a no-op when profiling is off"""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
+
@@ -0,0 +1,125 @@
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from instrumentation import stage
+
+OTHER_LABEL = "Other"
+TOP_N_OPTIONS = [10, 20, 50, 100]
+DEFAULT_TOP_N = 20
+# Scatter/line traces longer than this are drawn with WebGL...
+WEBGL_MIN_POINTS = 2_000
+# ...and thinned to at most this many points
+MAX_TRACE_POINTS = 20_000
+# Figures with fewer points than this are always small enough to send
+SIZE_CHECK_MIN_POINTS = 10_000
+MAX_FIGURE_BYTES = 2 * 1024 * 1024
+
+
+def chart_top_n() -> int:
+    """Categories per chart before the rest are folded into "Other" (sidebar setting)"""
+    return st.session_state.get("chart_top_n", DEFAULT_TOP_N)
+
+
+def top_n_with_other(df: pd.DataFrame, category, values, group=None, n=None) -> pd.DataFrame:
+    """
+    Keep the `n` categories with the largest totals of `values` and sum the rest
+    into one "Other" row (one per `group` value, e.g. per tier for stacked bars).
+    Kept rows stay in their order; "Other" comes last.
+    """
+    values = [values] if isinstance(values, str) else list(values)
+    group = [group] if isinstance(group, str) else list(group or [])
+    n = chart_top_n() if n is None else n
+
+    totals = df.groupby(category, observed=True, sort=False)[values].sum().sum(axis=1)
+    if len(totals) <= n:
+        return df
+    in_top = df[category].isin(totals.nlargest(n, keep='first').index)
+
+    rest = df[~in_top]
+    if group:
+        other = rest.groupby(group, observed=True, sort=False)[values].sum().reset_index()
+    else:
+        other = rest[values].sum().to_frame().T
+    other[category] = OTHER_LABEL
+    top = df[in_top].astype({category: object})
+    return pd.concat([top, other], ignore_index=True)[df.columns]
+
+
+def fold_into_other(counts: pd.Series, keep) -> pd.Series:
+    """(category, ...) counts with every category outside `keep` summed into "Other" """
+    labels = counts.index.get_level_values(0).astype(object)
+    outside = ~labels.isin(keep)
+    if not outside.any():
+        return counts
+    levels = [labels.where(~outside, OTHER_LABEL)]
+    levels += [counts.index.get_level_values(i) for i in range(1, counts.index.nlevels)]
+    return counts.groupby(levels, observed=True, sort=False).sum()
+
+
+def top_n_period_counts(counts1: pd.Series, counts2: pd.Series, categories, n=None):
+    """
+    Limit a two-period (category, tier) comparison to the `n` categories with the
+    most questions over both periods. Returns (categories, counts1, counts2) with
+    the others folded into "Other".
+    """
+    n = chart_top_n() if n is None else n
+    if len(categories) <= n:
+        return categories, counts1, counts2
+    totals = (
+        counts1.groupby(level=0, observed=True).sum()
+        .add(counts2.groupby(level=0, observed=True).sum(), fill_value=0)
+        .reindex(categories, fill_value=0)
+    )
+    keep = set(totals.nlargest(n, keep='first').index)
+    kept = [c for c in categories if c in keep]
+    return kept + [OTHER_LABEL], fold_into_other(counts1, keep), fold_into_other(counts2, keep)
+
+
+def trace_points(trace) -> int:
+    for attr in ("x", "y", "values"):
+        data = getattr(trace, attr, None)
+        if data is not None:
+            return len(data)
+    return 0
+
+
+def fit_dense_traces(fig: go.Figure) -> go.Figure:
+    """Draw long scatter/line traces with WebGL, thinned to MAX_TRACE_POINTS"""
+    traces, changed = [], False
+    for trace in fig.data:
+        points = trace_points(trace)
+        if trace.type not in ("scatter", "scattergl") or points <= WEBGL_MIN_POINTS:
+            traces.append(trace)
+            continue
+        props = trace.to_plotly_json()
+        props.pop("type", None)
+        step = -(-points // MAX_TRACE_POINTS)
+        if trace.type == "scattergl" and step == 1:
+            traces.append(trace)
+            continue
+        if step > 1:
+            for attr in ("x", "y", "text", "hovertext", "customdata"):
+                data = getattr(trace, attr, None)
+                if data is not None and not isinstance(data, str) and len(data) == points:
+                    props[attr] = data[::step]
+        traces.append(go.Scattergl(props, skip_invalid=True))
+        changed = True
+    return go.Figure(data=traces, layout=fig.layout) if changed else fig
+
+
+def plotly_chart(fig, **kwargs):
+    """
+    st.plotly_chart, recorded as a stage when profiling (covers figure serialization).
+    Dense traces are switched to WebGL and figures over MAX_FIGURE_BYTES are not sent.
+    """
+    with stage("plotly_chart"):
+        fig = fit_dense_traces(fig)
+        if sum(trace_points(trace) for trace in fig.data) > SIZE_CHECK_MIN_POINTS:
+            size = len(fig.to_json())
+            if size > MAX_FIGURE_BYTES:
+                st.warning(
+                    f"Chart skipped: it would send {size / 1e6:.1f} MB to the browser "
+                    f"(limit {MAX_FIGURE_BYTES / 1e6:.0f} MB). Lower 'Categories per chart' in the sidebar."
+                )
+                return
+        st.plotly_chart(fig, **kwargs)
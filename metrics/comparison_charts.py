@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+def period_tier_matrices(counts1: pd.Series, counts2: pd.Series, categories):
+    """
+    Reshape two (category, tier) count series into aligned category x tier matrices.
+    Tiers keep their order of appearance (period 1 first); missing combinations are 0.
+    """
+    tiers = counts1.index.get_level_values(-1).append(counts2.index.get_level_values(-1)).unique()
+
+    def to_matrix(counts):
+        if counts.empty:
+            return np.zeros((len(categories), len(tiers)), dtype=int)
+        return counts.unstack(fill_value=0).reindex(index=categories, columns=tiers, fill_value=0).to_numpy()
+
+    return list(tiers), to_matrix(counts1), to_matrix(counts2)
+
+
+def stacked_period_traces(counts1, counts2, categories, label1, label2):
+    """
+    Trace arrays for a stacked bar chart comparing two periods: each category gets
+    one bar per period ("Order (Week 1)", "Order (Week 2)", ...) stacked by tier.
+    Returns (x_labels, {tier: y_values}).
+    """
+    tiers, matrix1, matrix2 = period_tier_matrices(counts1, counts2, categories)
+    # Interleave the two periods row by row: cat1/p1, cat1/p2, cat2/p1, ...
+    values = np.stack([matrix1, matrix2], axis=1).reshape(-1, len(tiers))
+    x_labels = [f"{category} ({label})" for category in categories for label in (label1, label2)]
+    return x_labels, {tier: values[:, i] for i, tier in enumerate(tiers)}
+
+
+def stacked_period_figure(counts1, counts2, categories, label1, label2) -> go.Figure:
+    """Stacked bar figure with one trace per tier, built from stacked_period_traces"""
+    x_labels, tier_values = stacked_period_traces(counts1, counts2, categories, label1, label2)
+    fig = go.Figure()
+    for tier, y_values in tier_values.items():
+        fig.add_trace(go.Bar(x=x_labels, y=y_values, name=tier))
+    return fig
+
+
+def period_matrix(cubes: dict, dim: str) -> pd.DataFrame:
+    """Counts of `dim` (rows) for each period (columns, in the order of `cubes`), 0 where a value is missing"""
+    counts = {}
+    for label, cube in cubes.items():
+        rollup = cube.rollup([dim]) if cube.has(dim) else pd.Series(dtype=int)
+        rollup.index = rollup.index.astype(object)
+        counts[label] = rollup
+    return pd.concat(counts, axis=1).fillna(0).astype(int).reindex(columns=list(cubes))
@@ -0,0 +1,184 @@
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_loader import LRUCache
+from instrumentation import stage
+from row_index import RowIndex
+
+# Dimensions every metric page slices by
+CUBE_DIMENSIONS = ['Week', 'Week_Number', 'Merchants', 'Sales', 'Features Category', 'IT Support Tier', 'Period']
+# Cubes are shared between sessions, so their memoized roll-ups, pivots, metric
+# results and filtered sub-cubes (where()) are kept in thread-safe LRUs of these sizes
+MAX_MEMOIZED = 64
+MAX_SUBCUBES = 16
+# Dimensions the sidebar filters select on, resolved through a per-cube RowIndex
+INDEXED_DIMENSIONS = ['Merchants', 'Sales', 'Features Category', 'IT Support Tier']
+
+
+class CountCube:
+    """
+    Question counts keyed by (Week, Merchants, Sales, Features Category, IT Support Tier),
+    plus the Week_Number parsed from Week at ingest and, for several files loaded
+    together, the Period each row came from.
+    Built once per loaded dataset; metric pages read roll-ups from it instead of
+    scanning the raw rows on every rerun.
+    """
+
+    def __init__(self, counts: pd.DataFrame, dims):
+        self.counts = counts
+        self.dims = list(dims)
+        self._rollups = LRUCache(MAX_MEMOIZED)
+        self._pivots = LRUCache(MAX_MEMOIZED)
+        self._results = LRUCache(MAX_MEMOIZED)
+        self._subcubes = LRUCache(MAX_SUBCUBES)
+        self._row_index = None
+        self._row_index_lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return int(self.counts['Count'].sum())
+
+    @property
+    def row_index(self) -> RowIndex:
+        """Combinations (rows of `counts`) per value of each indexed dimension, built on the first filter"""
+        with self._row_index_lock:
+            if self._row_index is None:
+                self._row_index = RowIndex(self.counts, [dim for dim in INDEXED_DIMENSIONS if dim in self.dims])
+            return self._row_index
+
+    @property
+    def empty(self) -> bool:
+        return self.total == 0
+
+    def has(self, *dims) -> bool:
+        return all(dim in self.dims for dim in dims)
+
+    def rollup(self, dims) -> pd.Series:
+        """Counts grouped by `dims`. Missing values are dropped, like value_counts/pivot_table."""
+        dims = list(dims)
+        key = tuple(dims)
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            for dim in dims:
+                if dim not in self.dims:
+                    raise KeyError(dim)
+            subset = self.counts.dropna(subset=dims)
+            rollup = subset.groupby(dims, observed=True)['Count'].sum()
+            self._rollups.put(key, rollup)
+        # Roll-ups are shared between reruns, so hand out copies
+        return rollup.copy()
+
+    def value_counts(self, dim) -> pd.Series:
+        """Equivalent of df[dim].value_counts()"""
+        return self.rollup([dim]).sort_values(ascending=False, kind='stable')
+
+    def nunique(self, dim) -> int:
+        """Equivalent of df[dim].nunique()"""
+        return len(self.rollup([dim]))
+
+    def pivot(self, index, columns) -> pd.DataFrame:
+        """Equivalent of pd.pivot_table(df, index=index, columns=columns, aggfunc='size', fill_value=0)"""
+        key = (index, columns)
+        pivot = self._pivots.get(key)
+        if pivot is None:
+            pivot = self.rollup([index, columns]).unstack(columns, fill_value=0)
+            self._pivots.put(key, pivot)
+        return pivot.copy()
+
+    def filter(self, mask) -> "CountCube":
+        """Sub-cube for the combinations selected by a boolean mask over `counts`"""
+        return CountCube(self.counts[mask], self.dims)
+
+    def where(self, filters: dict) -> "CountCube":
+        """
+        Sub-cube keeping the combinations whose value in each filtered dimension is one
+        of the given values, e.g. {'Sales': ['Ann', 'Bob']}. The most recent ones are
+        kept, so metric results memoized on them survive reruns. Indexed dimensions
+        resolve through the row index; any other (e.g. Week) is scanned.
+        """
+        key = filter_key(filters)
+        if not key:
+            return self
+        cube = self._subcubes.get(key)
+        if cube is None:
+            index = self.row_index
+            ids = index.rows({dim: values for dim, values in key if index.has(dim)})
+            counts = self.counts.take(ids)
+            scanned = [(dim, values) for dim, values in key if not index.has(dim)]
+            if scanned:
+                mask = np.ones(len(counts), dtype=bool)
+                for dim, values in scanned:
+                    mask &= counts[dim].isin(values).to_numpy()
+                counts = counts[mask]
+            cube = CountCube(counts, self.dims)
+            self._subcubes.put(key, cube)
+        return cube
+
+    def add(self, other: "CountCube") -> "CountCube":
+        """Cube holding the counts of both cubes, e.g. to fold in appended rows"""
+        if not self.dims:
+            return CountCube(pd.DataFrame({'Count': [self.total + other.total]}), self.dims)
+        mine = self.counts.copy(deep=False)
+        theirs = other.counts.copy(deep=False)
+        for dim in self.dims:
+            if isinstance(mine[dim].dtype, pd.CategoricalDtype) and isinstance(theirs[dim].dtype, pd.CategoricalDtype):
+                categories = sorted(set(mine[dim].cat.categories).union(theirs[dim].cat.categories))
+                mine[dim] = mine[dim].cat.set_categories(categories)
+                theirs[dim] = theirs[dim].cat.set_categories(categories)
+        counts = (
+            pd.concat([mine, theirs], ignore_index=True)
+            .groupby(self.dims, dropna=False, observed=True, sort=False)['Count']
+            .sum()
+            .reset_index()
+        )
+        return CountCube(counts, self.dims)
+
+
+def filter_key(filters: dict) -> tuple:
+    """Hashable, order-independent form of {dimension: values}; unfiltered dimensions are left out"""
+    return tuple(sorted(
+        (dim, tuple(sorted(values, key=str))) for dim, values in (filters or {}).items() if len(values)
+    ))
+
+
+def memoized_compute(compute):
+    """
+    Memoize a metric's compute function on the cube it is called with and its other
+    arguments (e.g. the sort option). The dashboard keeps one cube per dataset version,
+    week and sidebar filters, so results are reused until one of those changes.
+    """
+    @functools.wraps(compute)
+    def wrapper(cube, *args, **kwargs):
+        key = (compute.__module__, compute.__name__, args, tuple(sorted(kwargs.items())))
+        result = cube._results.get(key)
+        if result is None:
+            result = compute(cube, *args, **kwargs)
+            cube._results.put(key, result)
+        # Renderers may adjust tables for display, so hand out copies
+        return {
+            name: value.copy() if isinstance(value, (pd.DataFrame, pd.Series)) else value
+            for name, value in result.items()
+        }
+    return wrapper
+
+
+def build_count_cube(df: pd.DataFrame, week_col: str = 'Week') -> CountCube:
+    """Aggregate the raw rows once into a CountCube"""
+    dims = []
+    for col in [week_col] + CUBE_DIMENSIONS[1:]:
+        if col in df.columns and col not in dims:
+            dims.append(col)
+
+    with stage("aggregate count cube"):
+        if not dims:
+            counts = pd.DataFrame({'Count': [len(df)]})
+        else:
+            counts = (
+                df.groupby(dims, dropna=False, observed=True, sort=False)
+                .size()
+                .reset_index(name='Count')
+            )
+    return CountCube(counts, dims)
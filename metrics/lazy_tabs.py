@@ -0,0 +1,19 @@
+import streamlit as st
+
+
+def lazy_tabs(labels, key: str) -> str:
+    """
+    Tab bar that only renders the active tab. st.tabs runs and sends every tab on
+    each rerun; here the caller draws just the returned label. The choice is kept
+    in st.session_state[key], so it survives switching to another section and back.
+    """
+    if st.session_state.get(key) not in labels:
+        st.session_state[key] = labels[0]
+    widget_key = f"{key}_tab"
+
+    def remember():
+        st.session_state[key] = st.session_state[widget_key]
+
+    # Streamlit drops a widget's state when it is not drawn, so restore it each run
+    st.session_state[widget_key] = st.session_state[key]
+    return st.radio("View", labels, key=widget_key, on_change=remember, horizontal=True, label_visibility="collapsed")
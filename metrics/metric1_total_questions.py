@@ -1,15 +1,30 @@
 import streamlit as st
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .paged_table import show_paged_table
 
-def show_total_questions(df):
+@memoized_compute
+def compute_total_questions(cube):
+    """Totals and questions per merchant"""
+    merchant_counts = cube.value_counts('Merchants').reset_index()
+    merchant_counts.columns = ['Merchant', 'Questions Asked']
+    return {
+        'total_questions': cube.total,
+        'total_merchants': cube.nunique('Merchants'),
+        'merchant_counts': merchant_counts
+    }
+
+def show_total_questions(df=None, cube=None):
+    if cube is None:
+        cube = build_count_cube(df)
+    with stage("compute"):
+        result = compute_total_questions(cube)
     st.header("Total Questions & Merchants")
-    total_questions = len(df)
-    total_merchants = df['Merchants'].nunique()
-    st.metric("Total Questions Asked", total_questions)
-    st.metric("Total Merchants", total_merchants)
+    st.metric("Total Questions Asked", result['total_questions'])
+    st.metric("Total Merchants", result['total_merchants'])
     st.write("---")
     st.subheader("Questions by Merchant")
-    merchant_counts = df['Merchants'].value_counts().reset_index()
-    merchant_counts.columns = ['Merchant', 'Questions Asked']
+    merchant_counts = result['merchant_counts']
     # Display with 1-based row index
     merchant_counts.index = merchant_counts.index + 1
-    st.dataframe(merchant_counts)
+    show_paged_table(merchant_counts, key="merchant_counts")
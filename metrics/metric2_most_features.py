@@ -1,23 +1,18 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from data_loader import FEATURES_LIST
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_with_other
+from .paged_table import show_paged_table
 
-def show_most_features(df, key_suffix=""):
-    st.header("Most Features Asked by Merchant")
-    
-    # Add sorting option
-    sort_option = st.selectbox(
-        "Sort by:",
-        ["Default", "Highest to Lowest", "Lowest to Highest"],
-        key=f"sort_most_features{key_suffix}"
-    )
-    
-    features_list = [
-        "Appointment", "Attendance", "Classroom", "E-Invoice", "Expenses", "General", "HARDWARE", "History", "Inventory", "Mall Integration", "Member", "Menu", "Message", "Online", "Booking", "Order", "Queue", "Receipt", "Report", "Roster", "Settings", "Shift", "Report", "SQL Integration", "Staff", "Tunai App", "Tunai Biz", "Tunai Staff", "Voucher", "Walk-in"
-    ]
-    feature_counts = df['Features Category'].value_counts().reset_index()
+
+@memoized_compute
+def compute_most_features(cube, sort_option="Default"):
+    """Counts of the known features, sorted for the chart, and the merchant x feature pivot"""
+    feature_counts = cube.value_counts('Features Category').reset_index()
     feature_counts.columns = ['Feature', 'Count']
-    feature_counts = feature_counts[feature_counts['Feature'].isin(features_list)]
+    feature_counts = feature_counts[feature_counts['Feature'].isin(FEATURES_LIST)]
     
     # Apply sorting based on selected option
     if sort_option == "Default":
@@ -27,13 +22,34 @@ def show_most_features(df, key_suffix=""):
     elif sort_option == "Lowest to Highest":
         feature_counts = feature_counts.sort_values('Count', ascending=True)
     
+    return {
+        'feature_counts': feature_counts,
+        'merchant_feature_pivot': cube.pivot('Merchants', 'Features Category')
+    }
+
+def show_most_features(df=None, key_suffix="", cube=None):
+    if cube is None:
+        cube = build_count_cube(df)
+    st.header("Most Features Asked by Merchant")
+    
+    # Add sorting option
+    sort_option = st.selectbox(
+        "Sort by:",
+        ["Default", "Highest to Lowest", "Lowest to Highest"],
+        key=f"sort_most_features{key_suffix}"
+    )
+    
+    with stage("compute"):
+        result = compute_most_features(cube, sort_option)
+    feature_counts = result['feature_counts']
+    
     # Create bar chart with plotly to preserve sorting order
-    fig = px.bar(feature_counts, x='Feature', y='Count', 
-                 title='Feature Requests Count',
-                 labels={'Feature': 'Feature', 'Count': 'Count'})
-    fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
+    with stage("figure"):
+        fig = px.bar(top_n_with_other(feature_counts, 'Feature', 'Count'), x='Feature', y='Count', 
+                     title='Feature Requests Count',
+                     labels={'Feature': 'Feature', 'Count': 'Count'})
+        fig.update_layout(xaxis_tickangle=-45)
+    plotly_chart(fig, use_container_width=True)
     st.write("---")
     st.subheader("Feature Requests by Merchant")
-    pivot = pd.pivot_table(df, index='Merchants', columns='Features Category', aggfunc='size', fill_value=0)
-    st.dataframe(pivot)
+    show_paged_table(result['merchant_feature_pivot'], key=f"merchant_features{key_suffix}")
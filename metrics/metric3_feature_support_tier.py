@@ -1,31 +1,44 @@
 import streamlit as st
 import plotly.express as px
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_with_other
 
-def show_feature_support_tier(df, key_suffix=""):
+@memoized_compute
+def compute_feature_support_tier(cube):
+    """Questions per IT support tier"""
+    tier_counts = cube.value_counts('IT Support Tier').reset_index()
+    tier_counts.columns = ['IT Support Tier', 'Count']
+    return {'tier_counts': tier_counts}
+
+def show_feature_support_tier(df=None, key_suffix="", cube=None):
+    if cube is None:
+        cube = build_count_cube(df)
     st.header("📊 Support Tier Overview")
     
     # Count occurrences of each support tier
-    tier_counts = df['IT Support Tier'].value_counts().reset_index()
-    tier_counts.columns = ['IT Support Tier', 'Count']
+    with stage("compute"):
+        tier_counts = compute_feature_support_tier(cube)['tier_counts']
     
     st.subheader("Support Tier Distribution")
     st.write("*Distribution of requests across IT Support Tiers: BUG, CODE, FIRST LAYER, OPERATION, REQUEST, SECOND LAYER, TRAINING*")
     
     # Create interactive pie chart
-    fig = px.pie(tier_counts, 
-                 values='Count',
-                 names='IT Support Tier',
-                 title='IT Support Tier Distribution',
-                 color_discrete_sequence=px.colors.qualitative.Set3)
+    with stage("figure"):
+        fig = px.pie(top_n_with_other(tier_counts, 'IT Support Tier', 'Count'), 
+                     values='Count',
+                     names='IT Support Tier',
+                     title='IT Support Tier Distribution',
+                     color_discrete_sequence=px.colors.qualitative.Set3)
     
-    fig.update_traces(textposition='inside', textinfo='percent+label')
+        fig.update_traces(textposition='inside', textinfo='percent+label')
     
-    fig.update_layout(
-        height=600,
-        legend_title_text='IT Support Tier'
-    )
+        fig.update_layout(
+            height=600,
+            legend_title_text='IT Support Tier'
+        )
     
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
     
     st.write("---")
     
@@ -1,19 +1,14 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_with_other
 
-def show_support_tier(df, key_suffix=""):
-    st.header("Feature & Support Tier")
-    
-    # Add sorting option
-    sort_option = st.selectbox(
-        "Sort by:",
-        ["Default", "Highest to Lowest", "Lowest to Highest"],
-        key=f"sort_metric4{key_suffix}"
-    )
-    
-    # Prepare data for interactive chart
-    feature_tier = df.groupby(['Features Category', 'IT Support Tier']).size().reset_index(name='Count')
+@memoized_compute
+def compute_support_tier(cube, sort_option="Default"):
+    """(Features Category, IT Support Tier) counts ordered by the selected feature sort, and the feature x tier pivot"""
+    feature_tier = cube.rollup(['Features Category', 'IT Support Tier']).reset_index(name='Count')
     
     # Calculate total count per feature for sorting
     feature_totals = feature_tier.groupby('Features Category')['Count'].sum().reset_index()
@@ -35,32 +30,53 @@ def show_support_tier(df, key_suffix=""):
     )
     feature_tier = feature_tier.sort_values('Features Category')
     
+    return {
+        'feature_tier': feature_tier,
+        'feature_tier_pivot': cube.pivot('Features Category', 'IT Support Tier')
+    }
+
+def show_support_tier(df=None, key_suffix="", cube=None):
+    if cube is None:
+        cube = build_count_cube(df)
+    st.header("Feature & Support Tier")
+    
+    # Add sorting option
+    sort_option = st.selectbox(
+        "Sort by:",
+        ["Default", "Highest to Lowest", "Lowest to Highest"],
+        key=f"sort_metric4{key_suffix}"
+    )
+    
+    with stage("compute"):
+        result = compute_support_tier(cube, sort_option)
+    feature_tier = result['feature_tier']
+    
     st.subheader("Interactive Chart: IT Support Tier by Feature Category")
     st.write("*Click on the legend items to show/hide specific support tiers*")
     
     # Create interactive bar chart
-    fig = px.bar(feature_tier, 
-                 x='Features Category',
-                 y='Count',
-                 color='IT Support Tier',
-                 title='IT Support Tier Distribution by Feature Category',
-                 barmode='stack',
-                 hover_data=['Count'])
-    
-    fig.update_layout(
-        height=600,
-        xaxis_title='Features Category',
-        yaxis_title='Count',
-        legend_title_text='IT Support Tier',
-        xaxis_tickangle=-45
-    )
+    with stage("figure"):
+        fig = px.bar(top_n_with_other(feature_tier, 'Features Category', 'Count', group='IT Support Tier'), 
+                     x='Features Category',
+                     y='Count',
+                     color='IT Support Tier',
+                     title='IT Support Tier Distribution by Feature Category',
+                     barmode='stack',
+                     hover_data=['Count'])
+    
+        fig.update_layout(
+            height=600,
+            xaxis_title='Features Category',
+            yaxis_title='Count',
+            legend_title_text='IT Support Tier',
+            xaxis_tickangle=-45
+        )
     
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
     
     st.write("---")
     
-    pivot = pd.pivot_table(df, index='Features Category', columns='IT Support Tier', aggfunc='size', fill_value=0)
-    st.dataframe(pivot)
+    st.dataframe(result['feature_tier_pivot'])
     st.write("---")
     
     st.subheader("Feature & Support Tier Details")
@@ -1,22 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from data_loader import SALES_LIST
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_with_other
 
-def show_top_sales_curiosity(df, key_suffix=""):
-    df.columns = df.columns.str.strip()
-    st.header("Top Sales with Most Customer's Curiosity")
-    
-    # Add sorting option
-    sort_option = st.selectbox(
-        "Sort by:",
-        ["Default", "Highest to Lowest", "Lowest to Highest"],
-        key=f"sort_metric5{key_suffix}"
-    )
-    
-    sales_list = ["Danny", "Dylan", "Erica", "Hazwan", "Jun", "Kyle", "Old Sales", "Qis", "Raymond", "Tammy", "Tom"]
-    sales_counts = df['Sales'].value_counts().reset_index()
+@memoized_compute
+def compute_top_sales_curiosity(cube, sort_option="Default"):
+    """Questions per known sales person, sorted for the chart"""
+    sales_counts = cube.value_counts('Sales').reset_index()
     sales_counts.columns = ['Sales', 'Questions Asked']
-    sales_counts = sales_counts[sales_counts['Sales'].isin(sales_list)]
+    sales_counts = sales_counts[sales_counts['Sales'].isin(SALES_LIST)]
     
     # Apply sorting based on selected option
     if sort_option == "Default":
@@ -26,12 +21,31 @@ def show_top_sales_curiosity(df, key_suffix=""):
     elif sort_option == "Lowest to Highest":
         sales_counts = sales_counts.sort_values('Questions Asked', ascending=True)
     
+    return {'sales_counts': sales_counts}
+
+def show_top_sales_curiosity(df=None, key_suffix="", cube=None):
+    if cube is None:
+        df.columns = df.columns.str.strip()
+        cube = build_count_cube(df)
+    st.header("Top Sales with Most Customer's Curiosity")
+    
+    # Add sorting option
+    sort_option = st.selectbox(
+        "Sort by:",
+        ["Default", "Highest to Lowest", "Lowest to Highest"],
+        key=f"sort_metric5{key_suffix}"
+    )
+    
+    with stage("compute"):
+        sales_counts = compute_top_sales_curiosity(cube, sort_option)['sales_counts']
+    
     # Create bar chart with plotly to preserve sorting order
-    fig = px.bar(sales_counts, x='Sales', y='Questions Asked', 
-                 title='Questions Asked by Sales',
-                 labels={'Sales': 'Sales Person', 'Questions Asked': 'Questions Asked'})
-    fig.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
+    with stage("figure"):
+        fig = px.bar(top_n_with_other(sales_counts, 'Sales', 'Questions Asked'), x='Sales', y='Questions Asked', 
+                     title='Questions Asked by Sales',
+                     labels={'Sales': 'Sales Person', 'Questions Asked': 'Questions Asked'})
+        fig.update_layout(xaxis_tickangle=-45)
+    plotly_chart(fig, use_container_width=True)
     st.write("---")
     st.subheader("Questions by Sales")
     # Display with 1-based row index
@@ -1,20 +1,14 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_with_other
 
-def show_sales_support_tier(df, key_suffix=""):
-    df.columns = df.columns.str.strip()
-    st.header("IT Support Tier for Each Sales")
-    
-    # Add sorting option
-    sort_option = st.selectbox(
-        "Sort by:",
-        ["Default", "Highest to Lowest", "Lowest to Highest"],
-        key=f"sort_metric6{key_suffix}"
-    )
-    
-    # Prepare data for interactive chart
-    sales_tier = df.groupby(['Sales', 'IT Support Tier']).size().reset_index(name='Count')
+@memoized_compute
+def compute_sales_support_tier(cube, sort_option="Default"):
+    """(Sales, IT Support Tier) counts ordered by the selected sales person sort, and the sales x tier pivot"""
+    sales_tier = cube.rollup(['Sales', 'IT Support Tier']).reset_index(name='Count')
     
     # Calculate total count per sales person for sorting
     sales_totals = sales_tier.groupby('Sales')['Count'].sum().reset_index()
@@ -36,25 +30,48 @@ def show_sales_support_tier(df, key_suffix=""):
     )
     sales_tier = sales_tier.sort_values('Sales')
     
+    return {
+        'sales_tier': sales_tier,
+        'sales_tier_pivot': cube.pivot('Sales', 'IT Support Tier')
+    }
+
+def show_sales_support_tier(df=None, key_suffix="", cube=None):
+    if cube is None:
+        df.columns = df.columns.str.strip()
+        cube = build_count_cube(df)
+    st.header("IT Support Tier for Each Sales")
+    
+    # Add sorting option
+    sort_option = st.selectbox(
+        "Sort by:",
+        ["Default", "Highest to Lowest", "Lowest to Highest"],
+        key=f"sort_metric6{key_suffix}"
+    )
+    
+    with stage("compute"):
+        result = compute_sales_support_tier(cube, sort_option)
+    sales_tier = result['sales_tier']
+    
     st.subheader("Interactive Chart: IT Support Tier by Sales")
     st.write("*Click on the legend items to show/hide specific support tiers*")
     
     # Create interactive stacked bar chart
-    fig = px.bar(sales_tier, 
-                 x='Sales', 
-                 y='Count',
-                 color='IT Support Tier',
-                 title='IT Support Tier Distribution by Sales Person',
-                 labels={'Count': 'Number of Questions', 'Sales': 'Sales Person'},
-                 barmode='stack')
-    
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        height=600,
-        legend_title_text='IT Support Tier (Click to toggle)'
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    with stage("figure"):
+        fig = px.bar(top_n_with_other(sales_tier, 'Sales', 'Count', group='IT Support Tier'), 
+                     x='Sales', 
+                     y='Count',
+                     color='IT Support Tier',
+                     title='IT Support Tier Distribution by Sales Person',
+                     labels={'Count': 'Number of Questions', 'Sales': 'Sales Person'},
+                     barmode='stack')
+    
+        fig.update_layout(
+            xaxis_tickangle=-45,
+            height=600,
+            legend_title_text='IT Support Tier (Click to toggle)'
+        )
+    
+    plotly_chart(fig, use_container_width=True)
     
     st.write("---")
     
@@ -82,5 +99,4 @@ def show_sales_support_tier(df, key_suffix=""):
     
     st.write("---")
     
-    pivot = pd.pivot_table(df, index='Sales', columns='IT Support Tier', aggfunc='size', fill_value=0)
-    st.dataframe(pivot)
\ No newline at end of file
+    st.dataframe(result['sales_tier_pivot'])
\ No newline at end of file
@@ -1,13 +1,138 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import plotly.express as px
-import re
 from .metric2_most_features import show_most_features
 from .metric3_feature_support_tier import show_feature_support_tier
 from .metric4_support_tier import show_support_tier
 from .metric5_top_sales_curiosity import show_top_sales_curiosity
 from .metric6_sales_support_tier import show_sales_support_tier
+from .count_cube import CountCube, build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_period_counts, top_n_with_other
+from .comparison_charts import stacked_period_figure
+from .lazy_tabs import lazy_tabs
+from data_loader import FEATURES_LIST, SALES_LIST, find_week_column, parse_week_numbers
+
+
+def week_matrix(cube: CountCube, dim: str) -> pd.DataFrame:
+    """Counts of `dim` (rows) per week number (columns), aggregated once and memoized on the cube"""
+    matrix = cube.pivot(dim, 'Week_Number')
+    matrix.columns = matrix.columns.astype(int)
+    return matrix
+
+
+def week_pair_table(matrix: pd.DataFrame, week1: int, week2: int, name: str) -> pd.DataFrame:
+    """Two week columns of a compute_week_comparison matrix as a comparison table, keeping values seen in either week"""
+    labels = [f'Week {week1}', f'Week {week2}']
+    pair = matrix.reindex(columns=labels, fill_value=0)
+    pair = pair[(pair > 0).any(axis=1)]
+    return pd.DataFrame({
+        name: pair.index,
+        labels[0]: pair[labels[0]].to_numpy(),
+        labels[1]: pair[labels[1]].to_numpy()
+    })
+
+
+def week_slice(counts: pd.Series, week: int) -> pd.Series:
+    """One week of a roll-up whose first level is Week_Number, with that level dropped"""
+    return counts[counts.index.get_level_values(0) == week].droplevel(0)
+
+
+def with_week_numbers(cube: CountCube, week_col: str) -> CountCube:
+    """The cube with a Week_Number dimension, parsing its week labels if ingest did not"""
+    if cube.has('Week_Number'):
+        return cube
+    week_numbers = parse_week_numbers(cube.counts[week_col])
+    return CountCube(cube.counts.assign(Week_Number=week_numbers), cube.dims + ['Week_Number'])
+
+
+@memoized_compute
+def compute_week_comparison(cube: CountCube):
+    """Totals per week and every-week matrices for features, support tiers and sales"""
+    week_totals = cube.rollup(['Week_Number'])
+    weeks = [int(w) for w in week_totals.index]
+    totals = pd.DataFrame({
+        'Week': [f"Week {w}" for w in weeks],
+        'Total Questions': week_totals.to_numpy()
+    })
+    if cube.has('Merchants'):
+        merchants_per_week = (week_matrix(cube, 'Merchants') > 0).sum()
+        totals['Unique Merchants'] = merchants_per_week.reindex(weeks, fill_value=0).to_numpy()
+    
+    result = {'week_totals': totals}
+    for key, dim in [('features_by_week', 'Features Category'), ('tiers_by_week', 'IT Support Tier'), ('sales_by_week', 'Sales')]:
+        if cube.has(dim):
+            matrix = week_matrix(cube, dim)
+            matrix.columns = [f"Week {w}" for w in matrix.columns]
+            result[key] = matrix
+    return result
+
+
+@memoized_compute
+def compute_week_pair(cube: CountCube, week1: int, week2: int):
+    """Two-week comparison tables for features, support tiers and sales, cut from compute_week_comparison's matrices"""
+    result = compute_week_comparison(cube)
+    labels = [f'Week {week1}', f'Week {week2}']
+    tables = {}
+    for key, matrix_key, name, allowed in [
+        ('features', 'features_by_week', 'Feature', FEATURES_LIST),
+        ('tiers', 'tiers_by_week', 'IT Support Tier', None),
+        ('sales', 'sales_by_week', 'Sales', SALES_LIST),
+    ]:
+        if matrix_key not in result:
+            continue
+        table = week_pair_table(result[matrix_key], week1, week2, name)
+        if allowed is not None:
+            table = table[table[name].isin(allowed)]
+            # Sort by total
+            table['Total'] = table[labels[0]] + table[labels[1]]
+            table = table.sort_values('Total', ascending=False, kind='stable')
+        tables[key] = table
+    return tables
+
+
+@memoized_compute
+def compute_week_pair_tiers(cube: CountCube, week1: int, week2: int, dim: str):
+    """Counts by (`dim`, IT Support Tier) in each of the two weeks, for the stacked comparison charts"""
+    by_week = cube.rollup(['Week_Number', dim, 'IT Support Tier'])
+    return {'week1': week_slice(by_week, week1), 'week2': week_slice(by_week, week2)}
+
+
+def show_week_trend(result, available_weeks):
+    """Every week side by side for features, support tiers and sales, from compute_week_comparison's result"""
+    week_labels = [f"Week {w}" for w in available_weeks]
+    
+    st.subheader("📈 Questions per Week")
+    totals_df = result['week_totals'][['Week', 'Total Questions']]
+    fig = px.line(totals_df, x='Week', y='Total Questions', markers=True, title='Total Questions by Week')
+    plotly_chart(fig, use_container_width=True)
+    
+    active_tab = lazy_tabs(["Features", "Support Tiers", "Sales"], key="week_trend_view")
+    
+    for tab, key, dim, allowed, title in [
+        ("Features", 'features_by_week', 'Features Category', FEATURES_LIST, 'Feature Requests by Week'),
+        ("Support Tiers", 'tiers_by_week', 'IT Support Tier', None, 'IT Support Tier Distribution by Week'),
+        ("Sales", 'sales_by_week', 'Sales', SALES_LIST, 'Questions Asked by Sales by Week'),
+    ]:
+        if tab == active_tab:
+            if key not in result:
+                st.info(f"No '{dim}' column in the dataset")
+                continue
+            matrix = result[key].reindex(columns=week_labels, fill_value=0)
+            if allowed is not None:
+                matrix = matrix[matrix.index.isin(allowed)]
+            matrix['Total'] = matrix.sum(axis=1)
+            matrix = matrix.sort_values('Total', ascending=False, kind='stable')
+            
+            chart_data = matrix.drop(columns='Total').rename_axis(dim).reset_index()
+            chart_data = top_n_with_other(chart_data, dim, week_labels)
+            fig = px.bar(chart_data, x=dim, y=week_labels,
+                         title=title,
+                         barmode='group',
+                         labels={'value': 'Count', 'variable': 'Week'})
+            fig.update_layout(xaxis_tickangle=-45, height=500)
+            plotly_chart(fig, use_container_width=True)
+            st.dataframe(matrix, use_container_width=True)
+
 
 def sort_for_bar_chart(df_in: pd.DataFrame, sort_col: str, order: str, x_col: str = None) -> pd.DataFrame:
     """Sort dataframe for bar chart display"""
@@ -27,7 +152,7 @@ def sort_for_bar_chart(df_in: pd.DataFrame, sort_col: str, order: str, x_col: st
     return df_in.sort_values(sort_col, ascending=ascending)
 
 
-def show_week_comparison(df):
+def show_week_comparison(df, cube=None):
     """
     Compare metrics between different weeks within the same dataset.
     Extracts week numbers from various formats: W1, W2, Week 1, 1, etc.
@@ -35,39 +160,25 @@ def show_week_comparison(df):
     st.header("📊 Week-to-Week Comparison")
     
     # Check if Week column exists
-    week_col = 'Week' if 'Week' in df.columns else df.columns[0]
+    week_col = find_week_column(df)
     
     if week_col not in df.columns:
         st.error("❌ No 'Week' column found in the dataset.")
         return
     
-    # Extract all week numbers from the data
-    def extract_week_number(value):
-        """Extract week number from various formats: JAN W1, W2, Week 1, 1, etc."""
-        if pd.isna(value):
-            return None
-        val_str = str(value).strip()
-        # Match patterns like: JAN W1, W2, w2, Week 1, week 1, or just 1
-        # This handles formats: "JAN W1", "W1", "Week 1", "1", etc.
-        match = re.search(r'[Ww](?:eek)?\s*(\d+)|(\d+)', val_str)
-        if match:
-            week_num = match.group(1) or match.group(2)
-            return int(week_num)
-        return None
-    
-    # Create a new column with extracted week numbers
-    df_with_weeks = df.copy()
-    df_with_weeks['Week_Number'] = df_with_weeks[week_col].apply(extract_week_number)
-    
-    # Remove rows without valid week numbers
-    df_with_weeks = df_with_weeks[df_with_weeks['Week_Number'].notna()]
-    
-    if df_with_weeks.empty:
+    if cube is None or week_col not in cube.dims:
+        cube = build_count_cube(df, week_col=week_col)
+    
+    # Week numbers are parsed at ingest; fall back to parsing the cube's week labels
+    cube = with_week_numbers(cube, week_col)
+    # Weeks with questions; combinations without a valid week number are left out
+    cube_week_numbers = cube.rollup(['Week_Number'])
+    if cube_week_numbers.empty:
         st.warning("⚠️ No valid week numbers found in the dataset.")
         return
     
     # Get available weeks sorted
-    available_weeks = sorted(df_with_weeks['Week_Number'].unique())
+    available_weeks = sorted(int(w) for w in cube_week_numbers.index)
     
     if len(available_weeks) < 2:
         st.info("ℹ️ Need at least 2 weeks of data to make a comparison.")
@@ -75,6 +186,17 @@ def show_week_comparison(df):
     
     st.info(f"📅 Available weeks: {', '.join(['Week ' + str(w) for w in available_weeks])}")
     
+    view_mode = st.radio(
+        "View",
+        ["Compare two weeks", "All weeks (trend)"],
+        horizontal=True,
+        key="week_view_mode"
+    )
+    if view_mode == "All weeks (trend)":
+        st.markdown("---")
+        show_week_trend(compute_week_comparison(cube), available_weeks)
+        return
+    
     # Week selection
     col1, col2 = st.columns(2)
     
@@ -101,9 +223,15 @@ def show_week_comparison(df):
             key="week2_selector"
         )
     
-    # Filter data for selected weeks
-    df_week1 = df_with_weeks[df_with_weeks['Week_Number'] == week1]
-    df_week2 = df_with_weeks[df_with_weeks['Week_Number'] == week2]
+    # Everything below selects the two weeks from per-week totals and matrices that
+    # are aggregated once per dataset, so changing the selection recomputes nothing
+    result = compute_week_comparison(cube)
+    week_totals = result['week_totals'].set_index('Week')
+    q1 = int(week_totals.at[f"Week {week1}", 'Total Questions'])
+    q2 = int(week_totals.at[f"Week {week2}", 'Total Questions'])
+    if cube.has('Merchants'):
+        m1 = int(week_totals.at[f"Week {week1}", 'Unique Merchants'])
+        m2 = int(week_totals.at[f"Week {week2}", 'Unique Merchants'])
     
     st.markdown("---")
     
@@ -113,8 +241,6 @@ def show_week_comparison(df):
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        q1 = len(df_week1)
-        q2 = len(df_week2)
         delta = q2 - q1
         delta_pct = ((q2 - q1) / q1 * 100) if q1 > 0 else 0
         st.metric(
@@ -125,9 +251,7 @@ def show_week_comparison(df):
         )
     
     with col2:
-        if 'Merchants' in df.columns:
-            m1 = df_week1['Merchants'].nunique()
-            m2 = df_week2['Merchants'].nunique()
+        if cube.has('Merchants'):
             delta = m2 - m1
             delta_pct = ((m2 - m1) / m1 * 100) if m1 > 0 else 0
             st.metric(
@@ -139,53 +263,38 @@ def show_week_comparison(df):
     
     st.markdown("---")
     
-    # Create tabs for different comparisons
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+    # Only the selected comparison is computed and drawn
+    active_tab = lazy_tabs([
         "Overview",
         "Top Features",
         "Support Tier Overview",
         "Feature & Support Tier",
         "Top Sales",
         "Sales Support Tier"
-    ])
+    ], key="week_comparison_view")
     
-    with tab1:
+    if active_tab == "Overview":
         st.subheader(f"📊 Detailed Overview: Week {week1} vs Week {week2}")
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.write(f"### Week {week1} Statistics")
-            st.metric("Total Questions", len(df_week1))
-            if 'Merchants' in df.columns:
-                st.metric("Unique Merchants", df_week1['Merchants'].nunique())
+            st.metric("Total Questions", q1)
+            if cube.has('Merchants'):
+                st.metric("Unique Merchants", m1)
         
         with col2:
             st.write(f"### Week {week2} Statistics")
-            st.metric("Total Questions", len(df_week2))
-            if 'Merchants' in df.columns:
-                st.metric("Unique Merchants", df_week2['Merchants'].nunique())
+            st.metric("Total Questions", q2)
+            if cube.has('Merchants'):
+                st.metric("Unique Merchants", m2)
     
-    with tab2:
+    if active_tab == "Top Features":
         st.subheader(f"🎯 Top Features Comparison: Week {week1} vs Week {week2}")
         
-        features_list = [
-            "Appointment", "Attendance", "Classroom", "E-Invoice", "Expenses", "General", "HARDWARE", "History", "Inventory", "Mall Integration", "Member", "Menu", "Message", "Online", "Booking", "Order", "Queue", "Receipt", "Report", "Roster", "Settings", "Shift", "Report", "SQL Integration", "Staff", "Tunai App", "Tunai Biz", "Tunai Staff", "Voucher", "Walk-in"
-        ]
-        
-        # Get feature counts for both weeks
-        features_w1 = df_week1['Features Category'].value_counts().reset_index()
-        features_w1.columns = ['Feature', f'Week {week1}']
-        features_w2 = df_week2['Features Category'].value_counts().reset_index()
-        features_w2.columns = ['Feature', f'Week {week2}']
-        
-        # Merge the two dataframes
-        features_comparison = features_w1.merge(features_w2, on='Feature', how='outer').fillna(0)
-        features_comparison = features_comparison[features_comparison['Feature'].isin(features_list)]
-        
-        # Sort by total
-        features_comparison['Total'] = features_comparison[f'Week {week1}'] + features_comparison[f'Week {week2}']
-        features_comparison = features_comparison.sort_values('Total', ascending=False)
+        # Feature counts for both weeks, sorted by total
+        features_comparison = compute_week_pair(cube, week1, week2)['features']
         
         # Add sort control
         sort_order_features = st.selectbox(
@@ -201,24 +310,18 @@ def show_week_comparison(df):
         )
         
         # Create grouped bar chart
-        fig = px.bar(features_chart_data, x='Feature', y=[f'Week {week1}', f'Week {week2}'],
+        fig = px.bar(top_n_with_other(features_chart_data, 'Feature', [f'Week {week1}', f'Week {week2}']), x='Feature', y=[f'Week {week1}', f'Week {week2}'],
                      title='Feature Requests Comparison',
                      barmode='group',
                      labels={'value': 'Count', 'variable': 'Week'})
         fig.update_layout(xaxis_tickangle=-45, height=500)
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
     
-    with tab3:
+    if active_tab == "Support Tier Overview":
         st.subheader(f"📊 Support Tier Overview Comparison: Week {week1} vs Week {week2}")
         
-        # Get support tier counts for both weeks
-        tier_w1 = df_week1['IT Support Tier'].value_counts().reset_index()
-        tier_w1.columns = ['IT Support Tier', f'Week {week1}']
-        tier_w2 = df_week2['IT Support Tier'].value_counts().reset_index()
-        tier_w2.columns = ['IT Support Tier', f'Week {week2}']
-        
-        # Merge the two dataframes
-        tier_comparison = tier_w1.merge(tier_w2, on='IT Support Tier', how='outer').fillna(0)
+        # Support tier counts for both weeks
+        tier_comparison = compute_week_pair(cube, week1, week2)['tiers']
         
         # Add sort control
         sort_order_tier = st.selectbox(
@@ -239,17 +342,14 @@ def show_week_comparison(df):
                      barmode='group',
                      labels={'value': 'Count', 'variable': 'Week'})
         fig.update_layout(xaxis_tickangle=-45, height=500)
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
     
-    with tab4:
+    if active_tab == "Feature & Support Tier":
         st.subheader(f"🔗 Feature & Support Tier Comparison: Week {week1} vs Week {week2}")
         
         # Build one stacked chart comparing two weeks (same style as metric4)
-        feature_tier_w1 = df_week1.groupby(['Features Category', 'IT Support Tier']).size().reset_index(name='Count')
-        feature_tier_w1['Week'] = f"Week {week1}"
-        feature_tier_w2 = df_week2.groupby(['Features Category', 'IT Support Tier']).size().reset_index(name='Count')
-        feature_tier_w2['Week'] = f"Week {week2}"
-        feature_tier_combined = pd.concat([feature_tier_w1, feature_tier_w2], ignore_index=True)
+        feature_tiers = compute_week_pair_tiers(cube, week1, week2, 'Features Category')
+        feature_tier_w1, feature_tier_w2 = feature_tiers['week1'], feature_tiers['week2']
         
         sort_order_feature_tier = st.selectbox(
             "Bar chart sort",
@@ -257,7 +357,7 @@ def show_week_comparison(df):
             key="feature_tier_bar_sort_week"
         )
         
-        if feature_tier_combined.empty:
+        if feature_tier_w1.empty and feature_tier_w2.empty:
             st.info("No feature or support tier data available")
         else:
             week2_label = f"Week {week2}"
@@ -265,49 +365,23 @@ def show_week_comparison(df):
             
             if sort_order_feature_tier == "Default":
                 feature_totals = (
-                    feature_tier_combined[feature_tier_combined['Week'] == week2_label]
-                    .groupby('Features Category')['Count']
+                    feature_tier_w2.groupby(level='Features Category')
                     .sum()
                     .sort_index()
                 )
             else:
                 feature_totals = (
-                    feature_tier_combined[feature_tier_combined['Week'] == week2_label]
-                    .groupby('Features Category')['Count']
+                    feature_tier_w2.groupby(level='Features Category')
                     .sum()
                     .sort_values(ascending=sort_order_feature_tier == "Lowest to Highest")
                 )
             unique_features = feature_totals.index.tolist()
+            unique_features, feature_tier_w1, feature_tier_w2 = top_n_period_counts(feature_tier_w1, feature_tier_w2, unique_features)
             
             st.subheader("Interactive Chart: IT Support Tier by Feature Category")
             st.write("*Click on the legend items to show/hide specific support tiers*")
             
-            fig = go.Figure()
-            for tier in feature_tier_combined['IT Support Tier'].unique():
-                x_labels = []
-                y_values = []
-                for feature in unique_features:
-                    w1_data = feature_tier_combined[
-                        (feature_tier_combined['Features Category'] == feature) &
-                        (feature_tier_combined['IT Support Tier'] == tier) &
-                        (feature_tier_combined['Week'] == week1_label)
-                    ]
-                    x_labels.append(f"{feature} ({week1_label})")
-                    y_values.append(w1_data['Count'].values[0] if len(w1_data) > 0 else 0)
-                    
-                    w2_data = feature_tier_combined[
-                        (feature_tier_combined['Features Category'] == feature) &
-                        (feature_tier_combined['IT Support Tier'] == tier) &
-                        (feature_tier_combined['Week'] == week2_label)
-                    ]
-                    x_labels.append(f"{feature} ({week2_label})")
-                    y_values.append(w2_data['Count'].values[0] if len(w2_data) > 0 else 0)
-                
-                fig.add_trace(go.Bar(
-                    x=x_labels,
-                    y=y_values,
-                    name=tier
-                ))
+            fig = stacked_period_figure(feature_tier_w1, feature_tier_w2, unique_features, week1_label, week2_label)
             
             fig.update_layout(
                 title=f'IT Support Tier Distribution by Feature Category - {week1_label} vs {week2_label}',
@@ -318,26 +392,13 @@ def show_week_comparison(df):
                 yaxis_title='Count',
                 legend_title_text='IT Support Tier (Click to toggle)'
             )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
     
-    with tab5:
+    if active_tab == "Top Sales":
         st.subheader(f"🏆 Top Sales Comparison: Week {week1} vs Week {week2}")
         
-        sales_list = ["Danny", "Dylan", "Erica", "Hazwan", "Jun", "Kyle", "Old Sales", "Qis", "Raymond", "Tammy", "Tom"]
-        
-        # Get sales counts for both weeks
-        sales_w1 = df_week1['Sales'].value_counts().reset_index()
-        sales_w1.columns = ['Sales', f'Week {week1}']
-        sales_w2 = df_week2['Sales'].value_counts().reset_index()
-        sales_w2.columns = ['Sales', f'Week {week2}']
-        
-        # Merge the two dataframes
-        sales_comparison = sales_w1.merge(sales_w2, on='Sales', how='outer').fillna(0)
-        sales_comparison = sales_comparison[sales_comparison['Sales'].isin(sales_list)]
-        
-        # Sort by total
-        sales_comparison['Total'] = sales_comparison[f'Week {week1}'] + sales_comparison[f'Week {week2}']
-        sales_comparison = sales_comparison.sort_values('Total', ascending=False)
+        # Sales counts for both weeks, sorted by total
+        sales_comparison = compute_week_pair(cube, week1, week2)['sales']
         
         # Add sort control
         sort_order_sales = st.selectbox(
@@ -353,22 +414,19 @@ def show_week_comparison(df):
         )
         
         # Create grouped bar chart
-        fig = px.bar(sales_chart_data, x='Sales', y=[f'Week {week1}', f'Week {week2}'],
+        fig = px.bar(top_n_with_other(sales_chart_data, 'Sales', [f'Week {week1}', f'Week {week2}']), x='Sales', y=[f'Week {week1}', f'Week {week2}'],
                      title='Questions Asked by Sales Comparison',
                      barmode='group',
                      labels={'value': 'Count', 'variable': 'Week'})
         fig.update_layout(xaxis_tickangle=-45, height=500)
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, use_container_width=True)
     
-    with tab6:
+    if active_tab == "Sales Support Tier":
         st.subheader(f"💼 Sales Support Tier Comparison: Week {week1} vs Week {week2}")
         
         # Build one stacked chart comparing two weeks (same style as metric8)
-        sales_tier_w1 = df_week1.groupby(['Sales', 'IT Support Tier']).size().reset_index(name='Count')
-        sales_tier_w1['Week'] = f"Week {week1}"
-        sales_tier_w2 = df_week2.groupby(['Sales', 'IT Support Tier']).size().reset_index(name='Count')
-        sales_tier_w2['Week'] = f"Week {week2}"
-        sales_tier_combined = pd.concat([sales_tier_w1, sales_tier_w2], ignore_index=True)
+        sales_tiers = compute_week_pair_tiers(cube, week1, week2, 'Sales')
+        sales_tier_w1, sales_tier_w2 = sales_tiers['week1'], sales_tiers['week2']
         
         sort_order_sales_tier = st.selectbox(
             "Bar chart sort",
@@ -376,7 +434,7 @@ def show_week_comparison(df):
             key="sales_tier_bar_sort_week"
         )
         
-        if sales_tier_combined.empty:
+        if sales_tier_w1.empty and sales_tier_w2.empty:
             st.info("No sales or support tier data available")
         else:
             week2_label = f"Week {week2}"
@@ -384,49 +442,23 @@ def show_week_comparison(df):
             
             if sort_order_sales_tier == "Default":
                 sales_totals = (
-                    sales_tier_combined[sales_tier_combined['Week'] == week2_label]
-                    .groupby('Sales')['Count']
+                    sales_tier_w2.groupby(level='Sales')
                     .sum()
                     .sort_index()
                 )
             else:
                 sales_totals = (
-                    sales_tier_combined[sales_tier_combined['Week'] == week2_label]
-                    .groupby('Sales')['Count']
+                    sales_tier_w2.groupby(level='Sales')
                     .sum()
                     .sort_values(ascending=sort_order_sales_tier == "Lowest to Highest")
                 )
             unique_sales = sales_totals.index.tolist()
+            unique_sales, sales_tier_w1, sales_tier_w2 = top_n_period_counts(sales_tier_w1, sales_tier_w2, unique_sales)
             
             st.subheader("Interactive Chart: IT Support Tier by Sales")
             st.write("*Click on the legend items to show/hide specific support tiers*")
             
-            fig = go.Figure()
-            for tier in sales_tier_combined['IT Support Tier'].unique():
-                x_labels = []
-                y_values = []
-                for sales in unique_sales:
-                    w1_data = sales_tier_combined[
-                        (sales_tier_combined['Sales'] == sales) &
-                        (sales_tier_combined['IT Support Tier'] == tier) &
-                        (sales_tier_combined['Week'] == week1_label)
-                    ]
-                    x_labels.append(f"{sales} ({week1_label})")
-                    y_values.append(w1_data['Count'].values[0] if len(w1_data) > 0 else 0)
-                    
-                    w2_data = sales_tier_combined[
-                        (sales_tier_combined['Sales'] == sales) &
-                        (sales_tier_combined['IT Support Tier'] == tier) &
-                        (sales_tier_combined['Week'] == week2_label)
-                    ]
-                    x_labels.append(f"{sales} ({week2_label})")
-                    y_values.append(w2_data['Count'].values[0] if len(w2_data) > 0 else 0)
-                
-                fig.add_trace(go.Bar(
-                    x=x_labels,
-                    y=y_values,
-                    name=tier
-                ))
+            fig = stacked_period_figure(sales_tier_w1, sales_tier_w2, unique_sales, week1_label, week2_label)
             
             fig.update_layout(
                 title=f'IT Support Tier Distribution by Sales Person - {week1_label} vs {week2_label}',
@@ -437,4 +469,4 @@ def show_week_comparison(df):
                 yaxis_title='Number of Questions',
                 legend_title_text='IT Support Tier (Click to toggle)'
             )
-            st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+            plotly_chart(fig, use_container_width=True)
\ No newline at end of file
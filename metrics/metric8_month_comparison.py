@@ -1,18 +1,192 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
-import re
-from urllib.parse import quote
+from instrumentation import stage
+from .count_cube import build_count_cube, memoized_compute
+from .chart_utils import plotly_chart, top_n_period_counts, top_n_with_other
+from .paged_table import show_paged_table
+from .lazy_tabs import lazy_tabs
+from .comparison_charts import period_matrix, period_tier_matrices, stacked_period_figure
+from data_loader import LRUCache, file_fingerprint, load_dataframe, load_workbook_sheets, workbook_sheet_names
+from google_sheets import InvalidSheetUrl, fetch_sheets, parse_sheet_url
 
-def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gid=None):
+# Count cubes per month sheet, keyed by (workbook fingerprint, sheet) or Google Sheet version
+_month_cubes = LRUCache(64)
+
+
+def month_cube(key, df):
+    """Count cube of one month's sheet, built once per sheet content"""
+    cube = _month_cubes.get(key)
+    if cube is None:
+        cube = build_count_cube(df)
+        _month_cubes.put(key, cube)
+    return cube
+
+
+def csv_month_cube(file):
+    """Count cube of an uploaded month CSV; the file is parsed only when its cube is not cached yet"""
+    key = file_fingerprint(file)
+    cube = _month_cubes.get(key)
+    if cube is None:
+        with stage("load file"):
+            cube = month_cube(key, load_dataframe(file))
+    return cube
+
+
+def compute_month_comparison(cubes: dict):
+    """Totals per month and month matrices for features, support tiers and sales"""
+    return {
+        'month_totals': pd.DataFrame({
+            'Month': list(cubes),
+            'Total Questions': [cube.total for cube in cubes.values()],
+            'Total Merchants': [cube.nunique('Merchants') if cube.has('Merchants') else 0 for cube in cubes.values()]
+        }),
+        'features_by_month': period_matrix(cubes, 'Features Category'),
+        'tiers_by_month': period_matrix(cubes, 'IT Support Tier'),
+        'sales_by_month': period_matrix(cubes, 'Sales')
+    }
+
+
+def month_pair_table(cube1, cube2, dim, name, month1_label, month2_label, top=None):
+    """Counts of `dim` in both months side by side with the change; with `top`, only the leading values"""
+    tables = []
+    for cube, label in [(cube1, month1_label), (cube2, month2_label)]:
+        counts = cube.value_counts(dim)
+        if top:
+            counts = counts.head(top)
+        table = counts.reset_index()
+        table.columns = [name, label]
+        tables.append(table)
+    comparison = tables[0].merge(tables[1], on=name, how='outer').fillna(0)
+    comparison['Change'] = comparison[month2_label] - comparison[month1_label]
+    if top:
+        comparison = comparison.sort_values(month2_label, ascending=False).head(top)
+    comparison.index = comparison.index + 1
+    return comparison
+
+
+@memoized_compute
+def compute_month_pair(cube1, cube2, month1_label, month2_label):
+    """Two-month comparison tables for the top features, support tiers and top sales"""
+    tables = {}
+    for key, dim, name, top in [
+        ('features', 'Features Category', 'Feature', 10),
+        ('tiers', 'IT Support Tier', 'IT Support Tier', None),
+        ('sales', 'Sales', 'Sales', 10),
+    ]:
+        if cube1.has(dim) and cube2.has(dim):
+            tables[key] = month_pair_table(cube1, cube2, dim, name, month1_label, month2_label, top)
+    return tables
+
+
+@memoized_compute
+def compute_month_feature_tiers(cube1, cube2, month1_label, month2_label):
+    """Feature x support tier counts per month, each feature's month 2 total and the side-by-side pivot"""
+    counts1 = cube1.rollup(['Features Category', 'IT Support Tier'])
+    counts2 = cube2.rollup(['Features Category', 'IT Support Tier'])
+    comparison = counts1.reset_index(name=month1_label).merge(
+        counts2.reset_index(name=month2_label),
+        on=['Features Category', 'IT Support Tier'],
+        how='outer'
+    ).fillna(0)
+    return {
+        'counts1': counts1,
+        'counts2': counts2,
+        'feature_totals': comparison.groupby('Features Category')[month2_label].sum(),
+        'pivot': pd.pivot_table(comparison, index='Features Category', columns='IT Support Tier', values=[month1_label, month2_label], aggfunc='sum', fill_value=0)
+    }
+
+
+@memoized_compute
+def compute_month_sales_tiers(cube1, cube2, month1_label, month2_label):
+    """Sales x support tier counts per month, as roll-ups for the chart and as detail tables"""
+    result = {}
+    for n, cube, label in [(1, cube1, month1_label), (2, cube2, month2_label)]:
+        counts = cube.rollup(['Sales', 'IT Support Tier'])
+        table = counts.reset_index(name='Count')
+        table['Month'] = label
+        result[f'counts{n}'] = counts
+        result[f'table{n}'] = table
+    return result
+
+
+def show_multi_month_comparison(cubes: dict):
+    """Side-by-side view of any number of months: totals, top features, tier mix and sales"""
+    months = list(cubes)
+    st.markdown("---")
+    st.subheader(f"📊 {len(months)} Months: {months[0]} to {months[-1]}")
+    
+    result = compute_month_comparison(cubes)
+    totals_df = result['month_totals']
+    
+    active_tab = lazy_tabs(["Overview", "Top Features", "Support Tier Mix", "Top Sales"], key="multi_month_view")
+    
+    if active_tab == "Overview":
+        fig = px.bar(totals_df, x='Month', y='Total Questions', title='Total Questions by Month')
+        fig.update_layout(height=400)
+        plotly_chart(fig, use_container_width=True)
+        st.dataframe(totals_df, use_container_width=True, hide_index=True)
+    
+    for tab, key, name, title in [
+        ("Top Features", 'features_by_month', 'Feature', 'Top Features by Month'),
+        ("Top Sales", 'sales_by_month', 'Sales', 'Top Sales by Month'),
+    ]:
+        if tab == active_tab:
+            matrix = result[key]
+            if matrix.empty:
+                st.info(f"No {name.lower()} data available")
+                continue
+            # Top categories over the whole period, the rest summed into "Other"
+            matrix = matrix.loc[matrix.sum(axis=1).sort_values(ascending=False, kind='stable').index]
+            chart_data = top_n_with_other(matrix.rename_axis(name).reset_index(), name, months)
+            matrix = chart_data.set_index(name)
+            fig = px.bar(chart_data, x=name, y=months,
+                         title=title,
+                         barmode='group',
+                         labels={'value': 'Count', 'variable': 'Month'})
+            fig.update_layout(xaxis_tickangle=-45, height=500, hovermode='x unified')
+            plotly_chart(fig, use_container_width=True)
+            st.dataframe(matrix, use_container_width=True)
+    
+    if active_tab == "Support Tier Mix":
+        tiers = result['tiers_by_month']
+        if tiers.empty:
+            st.info("No support tier data available")
+        else:
+            # Share of each tier within its month
+            share = tiers / tiers.sum().where(tiers.sum() > 0, 1) * 100
+            fig = go.Figure()
+            for tier, row in share.iterrows():
+                fig.add_trace(go.Bar(x=months, y=row.to_numpy(), name=str(tier)))
+            fig.update_layout(
+                title='IT Support Tier Mix by Month',
+                barmode='stack',
+                yaxis_title='% of Questions',
+                height=500,
+                legend_title_text='IT Support Tier (Click to toggle)'
+            )
+            plotly_chart(fig, use_container_width=True)
+            st.dataframe(tiers, use_container_width=True)
+
+def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gid=None, period_cubes=None):
     """
     Compare metrics between two months, where each month is a separate sheet.
     - Excel: compares two sheets in the same workbook
     - Google Sheets: compares two sheets by name or GID
     - CSV: compares two CSV files
+    Excel workbooks and Google Sheets (by name) can also show any number of months side by side,
+    as can several files uploaded together and months saved to the history store (period_cubes).
     """
     st.header("📅 Month-to-Month Comparison (by Sheet)")
+    
+    if period_cubes:
+        if len(period_cubes) < 2:
+            st.info("ℹ️ Select at least 2 months to compare.")
+            return
+        show_multi_month_comparison(period_cubes)
+        return
 
     def sort_for_bar_chart(df_in: pd.DataFrame, sort_col: str, order: str) -> pd.DataFrame:
         if df_in.empty or sort_col not in df_in.columns:
@@ -20,55 +194,46 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
         ascending = order == "Lowest to Highest"
         return df_in.sort_values(sort_col, ascending=ascending)
 
-    def clean_df(df_in: pd.DataFrame) -> pd.DataFrame:
-        df_out = df_in.copy()
-        df_out.columns = df_out.columns.astype(str).str.strip()
-        df_out = df_out.loc[:, ~df_out.columns.str.match(r"^Unnamed", na=False)]
-        df_out = df_out.dropna(how="all")
-        with pd.option_context("future.no_silent_downcasting", True):
-            df_out = df_out.convert_dtypes()
-        return df_out
-
-    def load_excel_sheet(file, sheet_name):
+    def load_excel_sheets(file, sheet_names):
+        """Cleaned frames for the selected sheets, parsed once per workbook and sheet"""
         try:
-            df_sheet = pd.read_excel(file, sheet_name=sheet_name)
-            return clean_df(df_sheet)
+            with stage("load sheets"):
+                return load_workbook_sheets(file, sheet_names)
         except Exception as e:
-            st.error(f"❌ Error loading Excel sheet '{sheet_name}': {str(e)}")
+            st.error(f"❌ Error loading Excel sheets {', '.join(map(str, sheet_names))}: {str(e)}")
             return None
 
-    def load_google_sheet(url, sheet_name=None, gid=None):
+    def load_google_sheets(url, requests):
+        """
+        Fetch the months concurrently through the shared sheet cache.
+        Returns a SheetVersion, or None if it failed, per request.
+        """
         try:
-            match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
-            if not match:
-                st.error("❌ Invalid Google Sheets URL. Please check the URL and try again.")
-                return None
-            sheet_id = match.group(1)
-
-            if sheet_name:
-                encoded_sheet_name = quote(sheet_name)
-                csv_export_url = (
-                    f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?"
-                    f"tqx=out:csv&sheet={encoded_sheet_name}"
-                )
+            sheet_id, url_gid = parse_sheet_url(url)
+        except InvalidSheetUrl:
+            st.error("❌ Invalid Google Sheets URL. Please check the URL and try again.")
+            return [None] * len(requests)
+
+        fetch_requests = []
+        for sheet_name, gid in requests:
+            if not sheet_name and gid is None:
+                gid = url_gid
+            fetch_requests.append((sheet_id, sheet_name, gid))
+
+        with stage("fetch sheets"):
+            results = fetch_sheets(fetch_requests)
+        versions = []
+        for result in results:
+            if isinstance(result, Exception):
+                st.error(f"❌ Error loading Google Sheet: {str(result)}")
+                st.info("💡 Make sure the Google Sheet is set to 'Anyone with the link can view'")
+                versions.append(None)
             else:
-                if gid is None:
-                    gid_match = re.search(r'(?:[?&#])gid=(\d+)', url)
-                    gid = gid_match.group(1) if gid_match else None
-                if gid:
-                    csv_export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
-                else:
-                    csv_export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-
-            df = pd.read_csv(csv_export_url)
-            return clean_df(df)
-        except Exception as e:
-            st.error(f"❌ Error loading Google Sheet: {str(e)}")
-            st.info("💡 Make sure the Google Sheet is set to 'Anyone with the link can view'")
-            return None
+                versions.append(result)
+        return versions
 
-    df1 = None
-    df2 = None
+    cube1 = None
+    cube2 = None
     month1_label = "Month 1"
     month2_label = "Month 2"
 
@@ -81,7 +246,7 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
         suffix = Path(filename).suffix.lower().lstrip(".")
 
         if suffix == "csv":
-            st.info("📄 CSV files don’t have sheets. Upload two CSVs to compare months.")
+            st.info("📄 CSV files don’t have sheets. Upload one CSV per month together to compare them all, or add a second CSV here.")
             col1, col2 = st.columns(2)
             with col1:
                 csv1 = uploaded_file
@@ -94,20 +259,30 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 st.warning("Please upload the second CSV to compare.")
                 return
 
-            df1 = clean_df(pd.read_csv(csv1))
-            df2 = clean_df(pd.read_csv(csv2))
+            cube1 = csv_month_cube(csv1)
+            cube2 = csv_month_cube(csv2)
 
         else:
-            try:
-                xls = pd.ExcelFile(uploaded_file, engine="openpyxl")
-            except Exception:
-                xls = pd.ExcelFile(uploaded_file)
-
-            sheet_names = xls.sheet_names
+            sheet_names = workbook_sheet_names(uploaded_file)
             if len(sheet_names) < 2:
                 st.warning("⚠️ This Excel file has only one sheet. Add another sheet to compare months.")
                 return
 
+            view_mode = st.radio("View", ["Compare two months", "Multiple months"], horizontal=True, key="month_view_mode")
+            if view_mode == "Multiple months":
+                selected_sheets = st.multiselect("Select Month Sheets", sheet_names, default=sheet_names, key="month_sheets")
+                if len(selected_sheets) < 2:
+                    st.info("Select at least two sheets to compare.")
+                    return
+                frames = load_excel_sheets(uploaded_file, selected_sheets)
+                if frames is None:
+                    return
+                fingerprint = file_fingerprint(uploaded_file)
+                show_multi_month_comparison({
+                    name: month_cube((fingerprint, name), frames[name]) for name in selected_sheets
+                })
+                return
+
             col1, col2 = st.columns(2)
             with col1:
                 sheet1 = st.selectbox("Select Month 1 Sheet", sheet_names, index=0, key="month1_sheet")
@@ -125,8 +300,11 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 st.error("❌ Please select two different sheets to compare")
                 return
 
-            df1 = load_excel_sheet(uploaded_file, sheet1)
-            df2 = load_excel_sheet(uploaded_file, sheet2)
+            frames = load_excel_sheets(uploaded_file, [sheet1, sheet2])
+            if frames is not None:
+                fingerprint = file_fingerprint(uploaded_file)
+                cube1 = month_cube((fingerprint, sheet1), frames[sheet1])
+                cube2 = month_cube((fingerprint, sheet2), frames[sheet2])
 
     else:
         if not google_sheet_url:
@@ -134,7 +312,21 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
             return
 
         st.info("💡 Compare two sheets by **Sheet Name** (e.g., Jan, Feb) or by **GID**.")
-        method = st.radio("Select Sheet Identifier", ["Sheet Name", "GID"], horizontal=True)
+        method = st.radio("Select Sheet Identifier", ["Sheet Name", "GID", "Multiple Sheet Names"], horizontal=True)
+
+        if method == "Multiple Sheet Names":
+            names_input = st.text_input("Month Sheet Names (comma-separated)", value="Jan, Feb, Mar", key="gsheet_names")
+            selected_sheets = list(dict.fromkeys(name.strip() for name in names_input.split(",") if name.strip()))
+            if len(selected_sheets) < 2:
+                st.info("Enter at least two sheet names to compare.")
+                return
+            versions = load_google_sheets(google_sheet_url, [(name, None) for name in selected_sheets])
+            if any(version is None for version in versions):
+                return
+            show_multi_month_comparison({
+                name: month_cube(version.fingerprint, version.df) for name, version in zip(selected_sheets, versions)
+            })
+            return
 
         col1, col2 = st.columns(2)
         if method == "Sheet Name":
@@ -149,8 +341,7 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 st.error("❌ Please enter two different sheet names to compare")
                 return
 
-            df1 = load_google_sheet(google_sheet_url, sheet_name=sheet1_name)
-            df2 = load_google_sheet(google_sheet_url, sheet_name=sheet2_name)
+            version1, version2 = load_google_sheets(google_sheet_url, [(sheet1_name, None), (sheet2_name, None)])
         else:
             with col1:
                 sheet1_gid = st.text_input("Month 1 GID", value=str(sheet_gid or "0"), key="gsheet_gid_1")
@@ -167,10 +358,14 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 st.error("❌ Please enter two different GIDs to compare")
                 return
 
-            df1 = load_google_sheet(google_sheet_url, gid=sheet1_gid)
-            df2 = load_google_sheet(google_sheet_url, gid=sheet2_gid)
+            version1, version2 = load_google_sheets(google_sheet_url, [(None, sheet1_gid), (None, sheet2_gid)])
+
+        if version1 is not None and version2 is not None:
+            cube1 = month_cube(version1.fingerprint, version1.df)
+            cube2 = month_cube(version2.fingerprint, version2.df)
 
-    if df1 is None or df2 is None or df1.empty or df2.empty:
+    # Each month is aggregated once per sheet; every tab below reads roll-ups from these
+    if cube1 is None or cube2 is None or cube1.empty or cube2.empty:
         st.warning("⚠️ One or both sheets are empty or could not be loaded.")
         return
     
@@ -179,13 +374,13 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
     st.subheader(f"📊 {month1_label} vs {month2_label}")
     
     # Calculate key metrics
-    metric1_total = len(df1)
-    metric2_total = len(df2)
+    metric1_total = cube1.total
+    metric2_total = cube2.total
     questions_change = metric2_total - metric1_total
     questions_change_pct = (questions_change / metric1_total * 100) if metric1_total > 0 else 0
     
-    metric1_merchants = df1['Merchants'].nunique() if 'Merchants' in df1.columns else 0
-    metric2_merchants = df2['Merchants'].nunique() if 'Merchants' in df2.columns else 0
+    metric1_merchants = cube1.nunique('Merchants') if cube1.has('Merchants') else 0
+    metric2_merchants = cube2.nunique('Merchants') if cube2.has('Merchants') else 0
     merchants_change = metric2_merchants - metric1_merchants
     
     # Show individual metric cards for quick reference
@@ -207,17 +402,17 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
     
     st.markdown("---")
     
-    # Detailed comparison tables
-    comparison_tabs = st.tabs([
+    # Detailed comparison tables; only the selected one is computed and drawn
+    active_tab = lazy_tabs([
         "Overview",
         "Top Feature Asked by Merchant",
         "Support Tier Overview",
         "Feature & Support Tier",
         "Top Sales",
         "IT Support Tier for Each Sales"
-    ])
+    ], key="month_comparison_view")
     
-    with comparison_tabs[0]:
+    if active_tab == "Overview":
         st.subheader("Detailed Comparison")
         summary_data = {
             "Metric": ["Total Questions", "Total Merchants"],
@@ -227,21 +422,11 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
         summary_df = pd.DataFrame(summary_data)
         st.dataframe(summary_df, use_container_width=True, hide_index=True)
     
-    with comparison_tabs[1]:
+    if active_tab == "Top Feature Asked by Merchant":
         st.subheader("Most Features Asked by Merchant")
-        if 'Features Category' in df1.columns and 'Features Category' in df2.columns:
-            # Get feature counts for both months
-            feature_counts1 = df1['Features Category'].value_counts().head(10).reset_index()
-            feature_counts1.columns = ['Feature', f'{month1_label}']
-            
-            feature_counts2 = df2['Features Category'].value_counts().head(10).reset_index()
-            feature_counts2.columns = ['Feature', f'{month2_label}']
-            
-            # Merge for comparison
-            features_comparison = feature_counts1.merge(feature_counts2, on='Feature', how='outer').fillna(0)
-            features_comparison['Change'] = features_comparison[f'{month2_label}'] - features_comparison[f'{month1_label}']
-            features_comparison = features_comparison.sort_values(f'{month2_label}', ascending=False).head(10)
-            features_comparison.index = features_comparison.index + 1
+        if cube1.has('Features Category') and cube2.has('Features Category'):
+            # Top 10 features of both months, side by side
+            features_comparison = compute_month_pair(cube1, cube2, month1_label, month2_label)['features']
             
             # Bar chart comparison
             if not features_comparison.empty:
@@ -268,7 +453,7 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                     height=400,
                     xaxis_tickangle=-45
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
             
             st.dataframe(features_comparison, use_container_width=True)
             
@@ -279,30 +464,21 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
             
             with col1:
                 st.write(f"**{month1_label}**")
-                pivot1 = pd.pivot_table(df1, index='Merchants', columns='Features Category', aggfunc='size', fill_value=0)
-                st.dataframe(pivot1)
+                pivot1 = cube1.pivot('Merchants', 'Features Category')
+                show_paged_table(pivot1, key="month1_merchant_features")
             
             with col2:
                 st.write(f"**{month2_label}**")
-                pivot2 = pd.pivot_table(df2, index='Merchants', columns='Features Category', aggfunc='size', fill_value=0)
-                st.dataframe(pivot2)
+                pivot2 = cube2.pivot('Merchants', 'Features Category')
+                show_paged_table(pivot2, key="month2_merchant_features")
         else:
             st.info("No feature or merchant data available")
     
-    with comparison_tabs[2]:
+    if active_tab == "Support Tier Overview":
         st.subheader("Support Tier Overview")
-        if 'IT Support Tier' in df1.columns and 'IT Support Tier' in df2.columns:
-            # Get tier counts for both months
-            tier1 = df1['IT Support Tier'].value_counts().reset_index()
-            tier1.columns = ['IT Support Tier', f'{month1_label}']
-            
-            tier2 = df2['IT Support Tier'].value_counts().reset_index()
-            tier2.columns = ['IT Support Tier', f'{month2_label}']
-            
-            # Merge for comparison
-            tier_comparison = tier1.merge(tier2, on='IT Support Tier', how='outer').fillna(0)
-            tier_comparison['Change'] = tier_comparison[f'{month2_label}'] - tier_comparison[f'{month1_label}']
-            tier_comparison.index = tier_comparison.index + 1
+        if cube1.has('IT Support Tier') and cube2.has('IT Support Tier'):
+            # Tier counts of both months, side by side
+            tier_comparison = compute_month_pair(cube1, cube2, month1_label, month2_label)['tiers']
             
             # Bar chart comparison
             if not tier_comparison.empty:
@@ -328,25 +504,18 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                     hovermode='x unified',
                     height=400
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
             
             st.dataframe(tier_comparison, use_container_width=True)
         else:
             st.info("No support tier data available")
     
-    with comparison_tabs[3]:
+    if active_tab == "Feature & Support Tier":
         st.subheader("Feature & Support Tier")
-        if 'Features Category' in df1.columns and 'IT Support Tier' in df1.columns:
+        if cube1.has('Features Category', 'IT Support Tier'):
             # Prepare data for both months
-            feature_tier1 = df1.groupby(['Features Category', 'IT Support Tier']).size().reset_index(name=f'{month1_label}')
-            feature_tier2 = df2.groupby(['Features Category', 'IT Support Tier']).size().reset_index(name=f'{month2_label}')
-            
-            # Merge for comparison
-            feature_tier_comparison = feature_tier1.merge(
-                feature_tier2,
-                on=['Features Category', 'IT Support Tier'],
-                how='outer'
-            ).fillna(0)
+            feature_tiers = compute_month_feature_tiers(cube1, cube2, month1_label, month2_label)
+            feature_tier_counts1, feature_tier_counts2 = feature_tiers['counts1'], feature_tiers['counts2']
             
             st.write("*Click on the legend items to show/hide specific support tiers*")
 
@@ -355,31 +524,29 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 ["Highest to Lowest", "Lowest to Highest"],
                 key="feature_tier_bar_sort"
             )
-            feature_totals = (
-                feature_tier_comparison.groupby('Features Category')[f'{month2_label}']
-                .sum()
-                .sort_values(ascending=sort_order_feature_tier == "Lowest to Highest")
+            feature_totals = feature_tiers['feature_totals'].sort_values(
+                ascending=sort_order_feature_tier == "Lowest to Highest"
             )
             ordered_features = feature_totals.index.tolist()
+            ordered_features, feature_tier_counts1, feature_tier_counts2 = top_n_period_counts(
+                feature_tier_counts1, feature_tier_counts2, ordered_features
+            )
             
-            # Create comparison bar chart
+            # Create comparison bar chart from one aligned feature x tier matrix per month
+            tiers, matrix1, matrix2 = period_tier_matrices(feature_tier_counts1, feature_tier_counts2, ordered_features)
             fig = go.Figure()
             
-            for tier in feature_tier_comparison['IT Support Tier'].unique():
-                tier_data = feature_tier_comparison[feature_tier_comparison['IT Support Tier'] == tier]
-                tier_data = tier_data.set_index('Features Category').reindex(ordered_features).reset_index()
+            for i, tier in enumerate(tiers):
                 fig.add_trace(go.Bar(
-                    x=tier_data['Features Category'],
-                    y=tier_data[f'{month1_label}'],
+                    x=ordered_features,
+                    y=matrix1[:, i],
                     name=f'{tier} ({month1_label})'
                 ))
             
-            for tier in feature_tier_comparison['IT Support Tier'].unique():
-                tier_data = feature_tier_comparison[feature_tier_comparison['IT Support Tier'] == tier]
-                tier_data = tier_data.set_index('Features Category').reindex(ordered_features).reset_index()
+            for i, tier in enumerate(tiers):
                 fig.add_trace(go.Bar(
-                    x=tier_data['Features Category'],
-                    y=tier_data[f'{month2_label}'],
+                    x=ordered_features,
+                    y=matrix2[:, i],
                     name=f'{tier} ({month2_label})'
                 ))
             
@@ -392,27 +559,18 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 xaxis_tickangle=-45,
                 hovermode='x unified'
             )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
             
             st.write("---")
-            pivot = pd.pivot_table(feature_tier_comparison, index='Features Category', columns='IT Support Tier', values=[f'{month1_label}', f'{month2_label}'], aggfunc='sum', fill_value=0)
-            st.dataframe(pivot)
+            st.dataframe(feature_tiers['pivot'])
         else:
             st.info("No feature or support tier data available")
     
-    with comparison_tabs[4]:
+    if active_tab == "Top Sales":
         st.subheader("Top Sales Comparison")
-        if 'Sales' in df1.columns and 'Sales' in df2.columns:
-            sales1 = df1['Sales'].value_counts().head(10).reset_index()
-            sales1.columns = ['Sales', f'{month1_label}']
-            
-            sales2 = df2['Sales'].value_counts().head(10).reset_index()
-            sales2.columns = ['Sales', f'{month2_label}']
-            
-            sales_comparison = sales1.merge(sales2, on='Sales', how='outer').fillna(0)
-            sales_comparison['Change'] = sales_comparison[f'{month2_label}'] - sales_comparison[f'{month1_label}']
-            sales_comparison = sales_comparison.sort_values(f'{month2_label}', ascending=False).head(10)
-            sales_comparison.index = sales_comparison.index + 1
+        if cube1.has('Sales') and cube2.has('Sales'):
+            # Top 10 sales of both months, side by side
+            sales_comparison = compute_month_pair(cube1, cube2, month1_label, month2_label)['sales']
             
             # Bar chart comparison
             if not sales_comparison.empty:
@@ -438,23 +596,19 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                     hovermode='x unified',
                     height=400
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
             
             st.dataframe(sales_comparison, use_container_width=True)
         else:
             st.info("No sales data available")
     
-    with comparison_tabs[5]:
+    if active_tab == "IT Support Tier for Each Sales":
         st.subheader("IT Support Tier for Each Sales")
-        if 'Sales' in df1.columns and 'IT Support Tier' in df1.columns:
+        if cube1.has('Sales', 'IT Support Tier'):
             # Prepare data for both months
-            sales_tier1 = df1.groupby(['Sales', 'IT Support Tier']).size().reset_index(name='Count')
-            sales_tier1['Month'] = month1_label
-            sales_tier2 = df2.groupby(['Sales', 'IT Support Tier']).size().reset_index(name='Count')
-            sales_tier2['Month'] = month2_label
-            
-            # Combine both months
-            sales_tier_combined = pd.concat([sales_tier1, sales_tier2], ignore_index=True)
+            sales_tiers = compute_month_sales_tiers(cube1, cube2, month1_label, month2_label)
+            sales_tier_counts1, sales_tier_counts2 = sales_tiers['counts1'], sales_tiers['counts2']
+            sales_tier1, sales_tier2 = sales_tiers['table1'], sales_tiers['table2']
             
             # Create ordered x-axis labels
             sort_order_sales_tier = st.selectbox(
@@ -463,51 +617,18 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 key="sales_tier_bar_sort"
             )
             sales_totals = (
-                sales_tier_combined[sales_tier_combined['Month'] == month2_label]
-                .groupby('Sales')['Count']
+                sales_tier_counts2.groupby(level='Sales')
                 .sum()
                 .sort_values(ascending=sort_order_sales_tier == "Lowest to Highest")
             )
             unique_sales = sales_totals.index.tolist()
-            ordered_labels = []
-            for sales in unique_sales:
-                ordered_labels.append(f"{sales} ({month1_label})")
-                ordered_labels.append(f"{sales} ({month2_label})")
+            unique_sales, sales_tier_counts1, sales_tier_counts2 = top_n_period_counts(sales_tier_counts1, sales_tier_counts2, unique_sales)
             
             st.subheader("Interactive Chart: IT Support Tier by Sales")
             st.write("*Click on the legend items to show/hide specific support tiers*")
             
             # Create interactive stacked bar chart for both months combined
-            fig = go.Figure()
-            
-            for tier in sales_tier_combined['IT Support Tier'].unique():
-                x_labels = []
-                y_values = []
-                
-                for sales in unique_sales:
-                    # Add month 1 data
-                    m1_data = sales_tier_combined[
-                        (sales_tier_combined['Sales'] == sales) &
-                        (sales_tier_combined['IT Support Tier'] == tier) &
-                        (sales_tier_combined['Month'] == month1_label)
-                    ]
-                    x_labels.append(f"{sales} ({month1_label})")
-                    y_values.append(m1_data['Count'].values[0] if len(m1_data) > 0 else 0)
-                    
-                    # Add month 2 data
-                    m2_data = sales_tier_combined[
-                        (sales_tier_combined['Sales'] == sales) &
-                        (sales_tier_combined['IT Support Tier'] == tier) &
-                        (sales_tier_combined['Month'] == month2_label)
-                    ]
-                    x_labels.append(f"{sales} ({month2_label})")
-                    y_values.append(m2_data['Count'].values[0] if len(m2_data) > 0 else 0)
-                
-                fig.add_trace(go.Bar(
-                    x=x_labels,
-                    y=y_values,
-                    name=tier
-                ))
+            fig = stacked_period_figure(sales_tier_counts1, sales_tier_counts2, unique_sales, month1_label, month2_label)
             
             fig.update_layout(
                 title=f'IT Support Tier Distribution by Sales Person - {month1_label} vs {month2_label}',
@@ -518,7 +639,7 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
                 yaxis_title='Number of Questions',
                 legend_title_text='IT Support Tier (Click to toggle)'
             )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
             
             st.write("---")
             
@@ -575,11 +696,11 @@ def show_month_comparison(data_source, uploaded_file, google_sheet_url, sheet_gi
             col1, col2 = st.columns(2)
             with col1:
                 st.write(f"**{month1_label}**")
-                pivot1 = pd.pivot_table(df1, index='Sales', columns='IT Support Tier', aggfunc='size', fill_value=0)
+                pivot1 = cube1.pivot('Sales', 'IT Support Tier')
                 st.dataframe(pivot1)
             with col2:
                 st.write(f"**{month2_label}**")
-                pivot2 = pd.pivot_table(df2, index='Sales', columns='IT Support Tier', aggfunc='size', fill_value=0)
+                pivot2 = cube2.pivot('Sales', 'IT Support Tier')
                 st.dataframe(pivot2)
         else:
             st.info("No sales or support tier data available")
@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def search_rows(table: pd.DataFrame, text: str) -> pd.DataFrame:
+    """Rows whose label or any text column contains `text` (case-insensitive)"""
+    if table.index.name is not None:
+        mask = table.index.astype(str).str.contains(text, case=False, regex=False)
+    else:
+        # Plain row numbers are not worth matching
+        mask = np.zeros(len(table), dtype=bool)
+    for col in table.columns:
+        if not pd.api.types.is_numeric_dtype(table[col]):
+            mask |= table[col].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    return table[mask]
+
+
+def show_paged_table(table: pd.DataFrame, key: str, page_size: int = 50):
+    """
+    Show a large table one page at a time. The full table stays on the server:
+    search, sort and paging run here and only the visible rows go to the browser,
+    so the payload does not grow with the number of rows.
+    """
+    index_name = table.index.name or "Index"
+    has_labels = table.index.name is not None
+    sort_options = ["Default"] + ([index_name] if has_labels else []) + list(table.columns)
+
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+    with col1:
+        search = st.text_input("Search", key=f"{key}_search", placeholder="Type to filter rows")
+    with col2:
+        sort_by = st.selectbox("Sort by", sort_options, key=f"{key}_sort", format_func=str)
+    with col3:
+        descending = st.checkbox("Descending", value=True, key=f"{key}_descending")
+    with col4:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=f"{key}_page_size")
+
+    view = search_rows(table, search) if search else table
+    if sort_by == index_name and has_labels:
+        view = view.sort_index(ascending=not descending, kind="stable")
+    elif sort_by != "Default":
+        view = view.sort_values(sort_by, ascending=not descending, kind="stable")
+
+    pages = max(1, math.ceil(len(view) / page_size))
+    page_key = f"{key}_page"
+    # A narrower search can leave the remembered page past the end
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    st.dataframe(view.iloc[start:start + page_size])
+    if len(view):
+        st.caption(f"Rows {start + 1:,}–{min(start + page_size, len(view)):,} of {len(view):,}")
+    else:
+        st.caption("No matching rows")
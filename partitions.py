@@ -0,0 +1,90 @@
+"""
+Period-partitioned row layout. At ingest the prepared rows are ordered by
+(Period, Week_Number), so each week of each period is one contiguous run of rows
+and a period is a run of consecutive weeks. Week and period views are then
+slices of the frame, which pandas returns without copying; a view spanning
+several periods concatenates only the runs involved.
+"""
+import numpy as np
+import pandas as pd
+
+# Row order of a prepared dataset, outermost first
+PARTITION_KEYS = ['Period', 'Week_Number']
+
+
+def partition_keys(df: pd.DataFrame) -> list:
+    """Per-row integer keys for the partition columns present; missing weeks sort last"""
+    keys = []
+    if 'Period' in df.columns:
+        keys.append(df['Period'].cat.codes.to_numpy())
+    if 'Week_Number' in df.columns:
+        keys.append(df['Week_Number'].to_numpy(dtype='int64', na_value=np.iinfo(np.int64).max))
+    return keys
+
+
+def sort_partitions(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows ordered by period, then week (stable); returned as is when already in order"""
+    keys = partition_keys(df)
+    if not keys or len(df) < 2:
+        return df
+    in_order = np.ones(len(df) - 1, dtype=bool)
+    ties = np.ones(len(df) - 1, dtype=bool)
+    for key in keys:
+        in_order &= ~ties | (key[1:] >= key[:-1])
+        ties &= key[1:] == key[:-1]
+    if in_order.all():
+        return df
+    # lexsort sorts by its last key first
+    order = np.lexsort(keys[::-1])
+    return df.take(order).reset_index(drop=True)
+
+
+class PartitionLayout:
+    """Row ranges of each (period, week) run of a frame"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        keys = partition_keys(df)
+        if keys and self.size:
+            changed = np.zeros(self.size - 1, dtype=bool)
+            for key in keys:
+                changed |= key[1:] != key[:-1]
+            self.starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+        else:
+            self.starts = np.zeros(min(self.size, 1), dtype=np.int64)
+        self.stops = np.append(self.starts[1:], self.size)[:len(self.starts)]
+        # Period and week of each run
+        runs = df.iloc[self.starts]
+        self.periods = runs['Period'].reset_index(drop=True) if 'Period' in df.columns else None
+        self.weeks = runs['Week_Number'].reset_index(drop=True) if 'Week_Number' in df.columns else None
+
+    def ranges(self, period=None, week=None) -> list:
+        """(start, stop) row ranges holding `period` and `week` (None for all), adjacent ones merged"""
+        keep = np.ones(len(self.starts), dtype=bool)
+        if period is not None:
+            keep &= self.periods.eq(period).fillna(False).to_numpy() if self.periods is not None else False
+        if week is not None:
+            keep &= self.weeks.eq(week).fillna(False).to_numpy() if self.weeks is not None else False
+        ranges = []
+        for start, stop in zip(self.starts[keep].tolist(), self.stops[keep].tolist()):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], stop)
+            else:
+                ranges.append((start, stop))
+        return ranges
+
+    def rows(self, df: pd.DataFrame, period=None, week=None) -> pd.DataFrame:
+        """Rows of `period` and `week`: a slice of `df` when they are one run, else the runs concatenated"""
+        ranges = self.ranges(period, week)
+        if not ranges:
+            return df.iloc[:0]
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            return df.iloc[start:stop]
+        return pd.concat([df.iloc[start:stop] for start, stop in ranges])
+
+    def clip(self, ids: np.ndarray, period=None, week=None) -> np.ndarray:
+        """The sorted row ids that fall in the ranges of `period` and `week`"""
+        ranges = self.ranges(period, week)
+        parts = [ids[np.searchsorted(ids, start):np.searchsorted(ids, stop)] for start, stop in ranges]
+        return np.concatenate(parts) if parts else ids[:0]
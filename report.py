@@ -0,0 +1,171 @@
+"""
+Headless batch report: compute the dashboard metrics for one or more CSV/XLSX
+files without a Streamlit session, and write JSON, CSV and a static HTML report
+per file. Files are processed in parallel worker processes.
+
+    python report.py data/*.xlsx --out reports --workers 8
+"""
+import argparse
+import html
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from data_loader import file_fingerprint, load_dataframe, parse_sheet, read_file_bytes, workbook_sheet_names
+from dataset import build_dataset
+from metrics.count_cube import build_count_cube
+from metrics.metric1_total_questions import compute_total_questions
+from metrics.metric2_most_features import compute_most_features
+from metrics.metric3_feature_support_tier import compute_feature_support_tier
+from metrics.metric4_support_tier import compute_support_tier
+from metrics.metric5_top_sales_curiosity import compute_top_sales_curiosity
+from metrics.metric6_sales_support_tier import compute_sales_support_tier
+from metrics.metric7_week_comparison import compute_week_comparison, with_week_numbers
+from metrics.metric8_month_comparison import compute_month_comparison
+
+
+def compute_metrics(path: Path) -> dict:
+    """
+    Every metric for one file, as {section title: {table name: DataFrame or number}}.
+    Sections whose columns are missing from the file are left out.
+    """
+    dataset = build_dataset(load_dataframe(path), file_fingerprint(path))
+    cube = dataset.cube
+
+    sections = {}
+
+    def add_section(title, compute, *args):
+        try:
+            sections[title] = compute(*args)
+        except KeyError as e:
+            print(f"  {path.name}: skipping '{title}', missing column {e}", file=sys.stderr)
+
+    add_section("Total Questions & Merchants", compute_total_questions, cube)
+    add_section("Most Features Asked by Merchant", compute_most_features, cube)
+    add_section("Support Tier Overview", compute_feature_support_tier, cube)
+    add_section("Feature & Support Tier", compute_support_tier, cube)
+    add_section("Top Sales with Most Customer's Curiosity", compute_top_sales_curiosity, cube)
+    add_section("IT Support Tier for Each Sales", compute_sales_support_tier, cube)
+
+    if dataset.week_col in dataset.df.columns:
+        week_cube = with_week_numbers(cube, dataset.week_col)
+        if week_cube.counts['Week_Number'].notna().any():
+            add_section("Week-to-Week Comparison", compute_week_comparison, week_cube)
+
+    # Each sheet of a workbook is a month; files are already spread over the
+    # worker processes, so sheets are parsed in this one
+    if path.suffix.lower() in (".xlsx", ".xls"):
+        sheet_names = workbook_sheet_names(path)
+        if len(sheet_names) > 1:
+            data = read_file_bytes(path)
+            cubes = {name: build_count_cube(parse_sheet(data, name)) for name in sheet_names}
+            add_section("Month-to-Month Comparison", compute_month_comparison, cubes)
+
+    return sections
+
+
+def export_table(table: pd.DataFrame) -> pd.DataFrame:
+    """Flat copy of a metric table: a named index becomes a column, headers become strings"""
+    table = table.reset_index(drop=table.index.name is None)
+    table.columns = [str(col) for col in table.columns]
+    return table
+
+
+def write_report(sections: dict, out_dir: Path, title: str):
+    """Write metrics.json, one CSV per table and report.html into out_dir"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = {}
+    body = []
+    for section, values in sections.items():
+        summary[section] = {}
+        body.append(f"<h2>{html.escape(section)}</h2>")
+        for name, value in values.items():
+            label = name.replace("_", " ").capitalize()
+            if isinstance(value, pd.DataFrame):
+                table = export_table(value)
+                table.to_csv(out_dir / f"{name}.csv", index=False)
+                summary[section][name] = json.loads(table.to_json(orient="records"))
+                body.append(f"<h3>{html.escape(label)}</h3>")
+                body.append(table.to_html(index=False, na_rep="", border=0, classes="table"))
+            else:
+                summary[section][name] = int(value)
+                body.append(f"<p class='metric'>{html.escape(label)}: <b>{int(value):,}</b></p>")
+
+    (out_dir / "metrics.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    (out_dir / "report.html").write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title>"
+        "<style>"
+        "body{font-family:sans-serif;margin:2rem;color:#1f2937}"
+        "h2{border-bottom:2px solid #e5e7eb;padding-bottom:.3rem;margin-top:2.5rem}"
+        ".table{border-collapse:collapse;font-size:.9rem}"
+        ".table th,.table td{padding:.25rem .75rem;border-bottom:1px solid #e5e7eb;text-align:left}"
+        ".table th{background:#f3f4f6}"
+        "</style></head><body>"
+        f"<h1>📊 Support Data Report: {html.escape(title)}</h1>\n"
+        + "\n".join(body)
+        + "\n</body></html>\n",
+        encoding="utf-8"
+    )
+
+
+def build_report(path, out_dir):
+    """Compute and write the report for one file; runs in a worker process"""
+    path, out_dir = Path(path), Path(out_dir)
+    write_report(compute_metrics(path), out_dir, path.name)
+    return out_dir
+
+
+def report_dirs(paths, out_root: Path):
+    """One output directory per input file, named after the file (numbered if names repeat)"""
+    dirs, seen = [], {}
+    for path in paths:
+        count = seen.get(path.stem, 0)
+        seen[path.stem] = count + 1
+        dirs.append(out_root / (path.stem if count == 0 else f"{path.stem}-{count + 1}"))
+    return dirs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the dashboard metrics for CSV/XLSX files without Streamlit.")
+    parser.add_argument("files", nargs="+", type=Path, help="CSV or Excel files")
+    parser.add_argument("--out", type=Path, default=Path("reports"), help="output directory (default: reports)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="files processed in parallel (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    out_dirs = report_dirs(args.files, args.out)
+    workers = max(1, min(args.workers, len(args.files)))
+    failed = 0
+
+    if workers == 1:
+        results = []
+        for path, out_dir in zip(args.files, out_dirs):
+            try:
+                results.append(build_report(path, out_dir))
+            except Exception as e:
+                results.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_report, path, out_dir) for path, out_dir in zip(args.files, out_dirs)]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+
+    for path, result in zip(args.files, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"❌ {path}: {result}", file=sys.stderr)
+        else:
+            print(f"✅ {path} -> {result}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+On-disk snapshots of prepared datasets, keyed by content fingerprint. A snapshot
+holds the cleaned, dictionary-encoded rows and the count cube as Parquet files
+(dtypes and category dictionaries included), so the same data loaded again, even
+after a server restart, is read back instead of parsed, cleaned and aggregated.
+Snapshots need pyarrow; without it they are silently skipped.
+"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+SNAPSHOT_DIR = Path(os.environ.get("DASHBOARD_SNAPSHOT_DIR", Path(__file__).parent / ".snapshots"))
+# Bump when the prepared layout changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 3
+# Least recently used snapshots beyond this are deleted
+MAX_SNAPSHOTS = 32
+
+_write_lock = threading.Lock()
+
+
+def snapshot_path(fingerprint: str) -> Path:
+    return SNAPSHOT_DIR / fingerprint
+
+
+def read_meta(fingerprint: str):
+    """A snapshot's meta.json, or None when it is missing or from another SNAPSHOT_VERSION"""
+    try:
+        meta = json.loads((snapshot_path(fingerprint) / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == SNAPSHOT_VERSION else None
+
+
+def has_snapshot(fingerprint: str) -> bool:
+    return pyarrow is not None and read_meta(fingerprint) is not None
+
+
+def read_snapshot(fingerprint: str):
+    """(rows, cube counts, meta) for a fingerprint, or None when there is no usable snapshot"""
+    meta = read_meta(fingerprint) if pyarrow is not None else None
+    if meta is None:
+        return None
+    path = snapshot_path(fingerprint)
+    try:
+        rows = pd.read_parquet(path / "rows.parquet")
+        counts = pd.read_parquet(path / "cube.parquet")
+        # Mark as recently used for pruning; a snapshot pruned meanwhile is a miss
+        os.utime(path / "meta.json")
+    except (OSError, ValueError):
+        return None
+    return rows, counts, meta
+
+
+def write_snapshot(fingerprint: str, rows: pd.DataFrame, counts: pd.DataFrame, meta: dict) -> bool:
+    """
+    Persist a prepared dataset. Files are written to a temporary directory that is
+    renamed into place, so readers never see a half-written snapshot. Returns False
+    when the data cannot be stored as Parquet (e.g. mixed-type object columns).
+    """
+    if pyarrow is None or has_snapshot(fingerprint):
+        return False
+    path = snapshot_path(fingerprint)
+    tmp = SNAPSHOT_DIR / f".{fingerprint}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        tmp.mkdir(parents=True, exist_ok=True)
+        rows.to_parquet(tmp / "rows.parquet")
+        counts.to_parquet(tmp / "cube.parquet")
+        (tmp / "meta.json").write_text(json.dumps({"version": SNAPSHOT_VERSION, **meta}), encoding="utf-8")
+        # A snapshot from an older SNAPSHOT_VERSION is replaced
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    except (OSError, ValueError, TypeError, pyarrow.lib.ArrowException):
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    prune_snapshots()
+    return True
+
+
+def write_snapshot_in_background(fingerprint: str, rows: pd.DataFrame, counts: pd.DataFrame, meta: dict):
+    """write_snapshot off the request path; the frames are never modified after ingest"""
+    def run():
+        with _write_lock:
+            write_snapshot(fingerprint, rows, counts, meta)
+    threading.Thread(target=run, name="dataset-snapshot", daemon=True).start()
+
+
+def prune_snapshots(max_snapshots: int = MAX_SNAPSHOTS):
+    """
+    Delete the least recently used snapshots beyond max_snapshots. Other processes
+    may prune or replace snapshots at the same time, so entries that vanish are skipped.
+    """
+    try:
+        entries = list(SNAPSHOT_DIR.iterdir())
+    except OSError:
+        return
+    snapshots = []
+    for path in entries:
+        try:
+            snapshots.append(((path / "meta.json").stat().st_mtime, path))
+        except OSError:
+            continue
+    snapshots.sort(key=lambda snapshot: snapshot[0], reverse=True)
+    for _, path in snapshots[max_snapshots:]:
+        shutil.rmtree(path, ignore_errors=True)
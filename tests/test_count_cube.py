@@ -0,0 +1,72 @@
+import sys
+import threading
+
+import pandas as pd
+
+from metrics.count_cube import MAX_MEMOIZED, MAX_SUBCUBES, build_count_cube, memoized_compute
+
+
+def support_cube(n=500):
+    df = pd.DataFrame({
+        'Week': [f"W{i % 4 + 1}" for i in range(n)],
+        'Merchants': [f"M{i % 40}" for i in range(n)],
+        'Sales': [f"S{i % 9}" for i in range(n)],
+    })
+    return build_count_cube(df)
+
+
+def test_where_matches_filtered_counts():
+    cube = support_cube()
+    sub = cube.where({'Sales': ['S1', 'S2'], 'Merchants': ['M1', 'M2', 'M10']})
+    expected = cube.counts[
+        cube.counts['Sales'].isin(['S1', 'S2']) & cube.counts['Merchants'].isin(['M1', 'M2', 'M10'])
+    ]['Count'].sum()
+    assert sub.total == expected
+    # Same filters in another order give the same memoized sub-cube
+    assert cube.where({'Merchants': ['M10', 'M2', 'M1'], 'Sales': ['S2', 'S1']}) is sub
+    assert cube.where({}) is cube
+
+
+def test_where_is_bounded_and_thread_safe():
+    cube = support_cube()
+    errors = []
+
+    def filter_many(offset):
+        # An unguarded OrderedDict raises these when sessions evict and insert at once
+        try:
+            for i in range(200):
+                cube.where({'Merchants': [f"M{(i + offset) % 40}"], 'Sales': [f"S{i % 9}"]})
+        except (KeyError, RuntimeError) as e:
+            errors.append(e)
+
+    # Switch threads as often as possible so sessions interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=filter_many, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(cube._subcubes) <= MAX_SUBCUBES
+
+
+def test_memoized_results_are_bounded():
+    calls = []
+
+    @memoized_compute
+    def top_merchants(cube, n):
+        calls.append(n)
+        return {'top': cube.value_counts('Merchants').head(n)}
+
+    cube = support_cube()
+    first = top_merchants(cube, 3)
+    assert top_merchants(cube, 3)['top'].equals(first['top'])
+    assert calls == [3]
+    for n in range(200):
+        top_merchants(cube, n)
+    assert len(cube._results) <= MAX_MEMOIZED
+    assert len(cube._rollups) <= MAX_MEMOIZED
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from data_loader import FEATURES_LIST, SALES_LIST, encode_categorical, parse_week_numbers, prepare_dataset
+from metrics.count_cube import build_count_cube
+from metrics.metric2_most_features import compute_most_features
+from metrics.metric5_top_sales_curiosity import compute_top_sales_curiosity
+
+
+def test_case_variants_merge_under_most_frequent_spelling():
+    encoded = encode_categorical(pd.Series(["Cafe A", "cafe a", "cafe a", " Cafe B", None]))
+    assert list(encoded.cat.categories) == ["Cafe B", "cafe a"]
+    assert encoded.tolist()[:4] == ["cafe a", "cafe a", "cafe a", "Cafe B"]
+    assert pd.isna(encoded.iloc[4])
+
+
+def test_blank_labels_are_missing_and_ties_keep_the_first_spelling():
+    encoded = encode_categorical(pd.Series(["", "  ", None, "Cafe", "cafe "], name="Merchants"))
+    assert list(encoded.cat.categories) == ["Cafe"]
+    assert encoded.isna().tolist() == [True, True, True, False, False]
+    assert encoded.tolist()[3:] == ["Cafe", "Cafe"]
+    assert encoded.name == "Merchants"
+
+
+def test_week_numbers_from_labels():
+    weeks = pd.Series(["JAN W1", "Week 2", "3", "w4", None, "W12", "no week", "JAN W1", 2.0], dtype=object)
+    numbers = parse_week_numbers(weeks)
+    assert str(numbers.dtype) == "Int64"
+    assert numbers.name == "Week_Number"
+    assert numbers.fillna(0).tolist() == [1, 2, 3, 4, 0, 12, 0, 1, 2]
+
+
+def test_allow_list_spelling_wins_over_lowercase_majority():
+    df = pd.DataFrame({
+        'Week': ["W1"] * 5,
+        'Merchants': ["M1", "M2", "M3", "M4", "M5"],
+        'Sales': ["tom", "tom", "tom", "Tom", "Erica"],
+        'Issue': ["q"] * 5,
+        'Features Category': ["order", "order", "ORDER", "Order", "Menu"],
+        'IT Support Tier': ["BUG"] * 5,
+    })
+    prepared = prepare_dataset(df)
+    assert "Order" in FEATURES_LIST and "Tom" in SALES_LIST
+    assert list(prepared['Features Category'].cat.categories) == ["Menu", "Order"]
+    assert list(prepared['Sales'].cat.categories) == ["Erica", "Tom"]
+
+    # No rows drop out of the metrics that filter on the allow-lists
+    cube = build_count_cube(prepared)
+    features = compute_most_features(cube)['feature_counts']
+    assert features.set_index('Feature')['Count'].to_dict() == {"Order": 4, "Menu": 1}
+    sales = compute_top_sales_curiosity(cube)['sales_counts']
+    assert sales.set_index('Sales')['Questions Asked'].to_dict() == {"Tom": 4, "Erica": 1}
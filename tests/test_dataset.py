@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import dataset as dataset_module
+import snapshots
+from data_loader import LRUCache
+from dataset import build_dataset, get_dataset, has_dataset
+
+
+def support_rows(n=200):
+    return pd.DataFrame({
+        'Week': [f"W{i % 4 + 1}" for i in range(n)],
+        'Merchants': [f"M{i % 7}" for i in range(n)],
+        'Sales': [["Danny", "Erica", "Tom"][i % 3] for i in range(n)],
+        'Issue': ["question"] * n,
+        'Features Category': [["Order", "Menu"][i % 2] for i in range(n)],
+        'IT Support Tier': [["BUG", "REQUEST", "TRAINING"][i % 3] for i in range(n)],
+    })
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    """Snapshots in a temporary directory and an empty in-memory dataset cache"""
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", tmp_path)
+    monkeypatch.setattr(dataset_module, "_datasets", LRUCache(4))
+    monkeypatch.setattr(dataset_module, "save_snapshot", lambda dataset: None)
+    return tmp_path
+
+
+def write_snapshot_for(fingerprint):
+    built = build_dataset(support_rows(), fingerprint)
+    meta = {"dims": built.cube.dims, "memory_before": built.memory_before, "memory_after": built.memory_after}
+    assert snapshots.write_snapshot(fingerprint, built.df, built.cube.counts, meta)
+    return built
+
+
+def test_snapshot_is_read_without_raw_rows(snapshot_dir):
+    built = write_snapshot_for("abc")
+    assert has_dataset("abc")
+    loaded = get_dataset(None, "abc")
+    assert loaded.cube.total == built.cube.total
+
+
+def test_corrupt_snapshot_is_a_miss(snapshot_dir):
+    write_snapshot_for("abc")
+    rows_file = snapshot_dir / "abc" / "rows.parquet"
+    rows_file.write_bytes(rows_file.read_bytes()[:100])
+    assert has_dataset("abc")
+
+    assert get_dataset(None, "abc") is None
+    # With the rows parsed again the dataset is rebuilt
+    rebuilt = get_dataset(support_rows(), "abc")
+    assert rebuilt.cube.total == 200
+
+
+def test_pruned_snapshot_is_a_miss(snapshot_dir):
+    write_snapshot_for("abc")
+    assert has_dataset("abc")
+    snapshots.prune_snapshots(max_snapshots=0)
+
+    assert get_dataset(None, "abc") is None
+    assert get_dataset(support_rows(), "abc").cube.total == 200
+
+
+def test_snapshot_pruned_while_read_is_a_miss(snapshot_dir, monkeypatch):
+    write_snapshot_for("abc")
+
+    def pruned(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+    # Another process prunes the snapshot between reading its files and touching it
+    monkeypatch.setattr(snapshots.os, "utime", pruned)
+    assert snapshots.read_snapshot("abc") is None
+
+
+class VanishingSnapshot:
+    """A snapshot directory that another process deletes right after it is listed"""
+
+    def __truediv__(self, name):
+        return SimpleNamespace(exists=lambda: True, stat=self.stat)
+
+    def stat(self):
+        raise FileNotFoundError("gone")
+
+
+def test_prune_skips_snapshots_that_vanish(snapshot_dir, monkeypatch):
+    write_snapshot_for("abc")
+    listed = [VanishingSnapshot(), snapshot_dir / "abc"]
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", SimpleNamespace(iterdir=lambda: iter(listed)))
+    snapshots.prune_snapshots(max_snapshots=1)
+    assert (snapshot_dir / "abc" / "meta.json").exists()
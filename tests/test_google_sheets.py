@@ -0,0 +1,145 @@
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import google_sheets
+from google_sheets import SheetCache, clear_sheet_cache, download_sheet, fetch_sheet, sheet_key
+
+
+def version(n=0):
+    return SimpleNamespace(n=n, checked_at=time.time())
+
+
+def test_download_locks_are_dropped_after_use():
+    cache = SheetCache(ttl=60, max_entries=4)
+    for i in range(50):
+        cache.get(("sheet", None, str(i)), lambda previous: version())
+    assert cache._key_locks == {}
+
+
+def test_concurrent_reads_share_one_download():
+    cache = SheetCache(ttl=60)
+    calls = []
+
+    def slow_fetch(previous):
+        calls.append(previous)
+        time.sleep(0.2)
+        return version()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(("sheet", None, None), slow_fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+    assert cache._key_locks == {}
+
+
+def test_update_clears_a_pending_refresh():
+    cache = SheetCache(ttl=60)
+    key = ("sheet", None, None)
+    # Checked 10 s ago: still within the TTL, but past the refresh cooldown
+    cache.get(key, lambda previous: SimpleNamespace(n=1, checked_at=time.time() - 10))
+    cache.invalidate(key)
+    # A background poll fetches the sheet before anyone reads it again...
+    cache.update(key, lambda previous: version(2))
+    # ...so the next read uses that version instead of downloading again
+    assert cache.get(key, lambda previous: version(3)).n == 2
+
+
+def test_clear_forgets_pending_refreshes():
+    cache = SheetCache(ttl=60)
+    key = ("sheet", None, None)
+    cache.get(key, lambda previous: SimpleNamespace(n=1, checked_at=time.time() - 60))
+    cache.invalidate(key)
+    cache.clear()
+    assert cache._stale == set()
+    assert cache._key_locks == {}
+
+
+class SheetHandler(BaseHTTPRequestHandler):
+    """Serves the stand-in's current CSV with an ETag, answering 304 when it matches"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        etag = f'"{len(server.body)}-{hash(server.body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            server.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SheetHandler)
+    server.body = b""
+    server.requests = []
+    server.not_modified = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(google_sheets, "GOOGLE_SHEETS_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    clear_sheet_cache()
+    yield server
+    clear_sheet_cache()
+    server.shutdown()
+    server.server_close()
+
+
+SHEET_CSV = (
+    b"Week,Merchants,Sales,Issue,Features Category,IT Support Tier\n"
+    b"W1,Cafe A,Danny,Login,Order,BUG\n"
+    b"W1,Cafe B,Tom,Printer,Receipt,REQUEST\n"
+)
+
+
+def test_download_from_stand_in(sheet_server):
+    sheet_server.body = SHEET_CSV
+    version = download_sheet("abc123", gid="7")
+    assert sheet_server.requests == ["/abc123/export?format=csv&gid=7"]
+    assert version.df["Merchants"].tolist() == ["Cafe A", "Cafe B"]
+    assert version.etag is not None
+
+
+def test_not_modified_reuses_cached_frame(sheet_server):
+    sheet_server.body = SHEET_CSV
+    first = fetch_sheet("abc123")
+    # Let the cached version expire so the next read revalidates it
+    expired = replace(first, checked_at=first.checked_at - google_sheets.SHEET_CACHE_TTL)
+    google_sheets._sheet_cache._versions.put(sheet_key("abc123"), expired)
+
+    second = fetch_sheet("abc123")
+    assert len(sheet_server.requests) == 2
+    assert sheet_server.not_modified == 1
+    assert second.df is first.df
+    assert second.fingerprint == first.fingerprint
+    assert second.checked_at > expired.checked_at
+
+
+def test_appended_rows_are_parsed_alone(sheet_server):
+    sheet_server.body = SHEET_CSV
+    first = download_sheet("abc123")
+    sheet_server.body = SHEET_CSV + b"W2,Cafe C,Erica,Menu,Menu,TRAINING\n"
+    second = download_sheet("abc123", previous=first)
+
+    assert second.base_fingerprint == first.fingerprint
+    assert second.new_rows["Merchants"].tolist() == ["Cafe C"]
+    assert second.df["Merchants"].tolist() == ["Cafe A", "Cafe B", "Cafe C"]
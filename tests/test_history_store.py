@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+from data_loader import prepare_dataset
+from history_store import HistoryStore, guess_month_label
+from metrics.count_cube import build_count_cube
+
+
+def support_rows(month="JAN", n=300):
+    return pd.DataFrame({
+        'Week': [f"{month} W{i % 4 + 1}" for i in range(n)],
+        'Merchants': [f"M{i % 11}" for i in range(n)],
+        'Sales': [["Danny", "Erica", "Tom", None][i % 4] for i in range(n)],
+        'Features Category': [["Order", "Menu", "Voucher"][i % 3] for i in range(n)],
+        'IT Support Tier': [["BUG", "REQUEST", "TRAINING", "CODE", "OPERATION"][i % 5] for i in range(n)],
+    })
+
+
+def as_dict(rollup):
+    """Roll-up as {labels: count} with string labels, so categorical and SQL results compare"""
+    return {
+        tuple(map(str, key)) if isinstance(key, tuple) else (str(key),): int(count)
+        for key, count in rollup.items()
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(tmp_path / "history.sqlite")
+
+
+def test_month_label_needs_a_whole_month_word():
+    cube = build_count_cube(pd.DataFrame({'Week': ["Market W1", "Market W2", "MARCH W3"]}))
+    assert guess_month_label(cube, 'Week', fallback="2026-10") == "Mar"
+    cube = build_count_cube(pd.DataFrame({'Week': ["Market W1", "Decoy W2"]}))
+    assert guess_month_label(cube, 'Week', fallback="2026-10") == "2026-10"
+    cube = build_count_cube(pd.DataFrame({'Week': ["January week 1", "JAN W2", "Sept W3"]}))
+    assert guess_month_label(cube, 'Week', fallback="2026-10") == "Jan"
+
+
+@pytest.mark.parametrize("dims", [
+    ['Week_Number'],
+    ['Merchants'],
+    ['Sales'],
+    ['Features Category', 'IT Support Tier'],
+    ['Week_Number', 'Sales', 'IT Support Tier'],
+])
+def test_sql_rollups_match_count_cube(store, dims):
+    cube = build_count_cube(prepare_dataset(support_rows()))
+    assert store.add("Jan", "jan-v1", cube)
+
+    saved = store.cube(["Jan"])
+    assert saved.total == cube.total
+    assert as_dict(saved.rollup(dims)) == as_dict(cube.rollup(dims))
+    week = saved.week(2)
+    expected = cube.filter(cube.counts['Week_Number'].eq(2).fillna(False).to_numpy())
+    assert as_dict(week.rollup(dims)) == as_dict(expected.rollup(dims))
+
+
+def test_months_roll_up_together_and_filter_like_count_cube(store):
+    jan = build_count_cube(prepare_dataset(support_rows("JAN")))
+    feb = build_count_cube(prepare_dataset(support_rows("FEB", n=200)))
+    store.add("Jan", "jan-v1", jan)
+    store.add("Feb", "feb-v1", feb)
+
+    both = store.cube(["Jan", "Feb"])
+    assert both.total == jan.total + feb.total
+    merchants = as_dict(both.rollup(['Merchants']))
+    assert merchants == as_dict(jan.add(feb).rollup(['Merchants']))
+
+    filters = {'Sales': ['Tom'], 'IT Support Tier': ['BUG', 'CODE']}
+    assert as_dict(store.cube(["Jan"]).where(filters).rollup(['Merchants'])) == as_dict(jan.where(filters).rollup(['Merchants']))
+
+
+def test_saving_a_month_again_replaces_it(store):
+    cube = build_count_cube(prepare_dataset(support_rows()))
+    assert store.add("Jan", "jan-v1", cube)
+    assert not store.add("Jan", "jan-v1", cube)
+    grown = build_count_cube(prepare_dataset(support_rows(n=400)))
+    assert store.add("Jan", "jan-v2", grown)
+    assert store.cube(["Jan"]).total == 400
+    assert store.months()['month'].tolist() == ["Jan"]
+
+
+def test_remove_keeps_a_month_replaced_meanwhile(store):
+    cube = build_count_cube(prepare_dataset(support_rows()))
+    store.add("Jan", "jan-v2", cube)
+    store.remove("Jan", fingerprint="jan-v1")
+    assert store.months()['month'].tolist() == ["Jan"]
+    store.remove("Jan", fingerprint="jan-v2")
+    assert store.months().empty
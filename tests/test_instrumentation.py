@@ -0,0 +1,49 @@
+import tracemalloc
+
+import instrumentation
+from instrumentation import start_memory_tracing, start_profile, stage, stop_memory_tracing, stop_profile
+
+
+def test_memory_tracing_stays_on_while_another_session_traces():
+    start_memory_tracing("session-a")
+    start_memory_tracing("session-b")
+    try:
+        # A session with tracing off must not stop it for the others
+        stop_memory_tracing("session-c")
+        assert tracemalloc.is_tracing()
+        stop_memory_tracing("session-a")
+        assert tracemalloc.is_tracing()
+        # Reruns register the same session again without double counting
+        start_memory_tracing("session-b")
+    finally:
+        stop_memory_tracing("session-b")
+    assert not tracemalloc.is_tracing()
+
+
+def test_abandoned_session_stops_holding_tracing(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(instrumentation.time, "monotonic", lambda: clock[0])
+    # A session turns tracing on, then its tab is closed without turning it off
+    start_memory_tracing("closed-session")
+    clock[0] += instrumentation.MEMORY_TRACER_TIMEOUT + 1
+    start_profile(tracer="session-b")
+    stop_profile()
+    assert set(instrumentation._memory_tracers) == {"session-b"}
+    # Once the active session turns tracing off, nothing keeps it running
+    stop_memory_tracing("session-b")
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_records_stage_memory():
+    profile = start_profile(tracer="session-a")
+    try:
+        with stage("allocate"):
+            block = bytearray(2_000_000)
+    finally:
+        stop_profile()
+        stop_memory_tracing("session-a")
+    assert len(block) == 2_000_000
+    (record,) = profile.records
+    assert record["stage"] == "allocate"
+    assert record["peak_bytes"] >= 2_000_000
+    assert not tracemalloc.is_tracing()
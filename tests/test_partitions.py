@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from partitions import PartitionLayout, sort_partitions
+
+
+def partitioned_rows():
+    # Period p1 holds weeks 1, 2 and a row without a week; p2 holds weeks 1, 3 and a row without a week
+    df = pd.DataFrame({
+        'Period': pd.Categorical(["p2", "p1", "p1", "p2", "p1", "p1", "p2", "p1"], categories=["p1", "p2"], ordered=True),
+        'Week_Number': pd.array([3, 2, 1, None, 1, 2, 1, None], dtype="Int64"),
+        'Merchants': [f"M{i}" for i in range(8)],
+    })
+    return sort_partitions(df)
+
+
+def test_rows_are_ordered_by_period_then_week():
+    df = partitioned_rows()
+    assert df['Period'].tolist() == ["p1"] * 5 + ["p2"] * 3
+    # Rows without a week sort last in their period
+    assert df['Week_Number'].fillna(0).tolist() == [1, 1, 2, 2, 0, 1, 3, 0]
+    # Stable: rows of one run keep their original order
+    assert df['Merchants'].tolist() == ["M2", "M4", "M1", "M5", "M7", "M6", "M0", "M3"]
+
+
+def test_ranges_of_weeks_and_periods():
+    df = partitioned_rows()
+    layout = PartitionLayout(df)
+    assert layout.ranges() == [(0, 8)]
+    assert layout.ranges(period="p1") == [(0, 5)]
+    assert layout.ranges(period="p2") == [(5, 8)]
+    # Week 1 is a run in each period; the two runs are not adjacent
+    assert layout.ranges(week=1) == [(0, 2), (5, 6)]
+    assert layout.ranges(period="p2", week=1) == [(5, 6)]
+    assert layout.ranges(period="p1", week=3) == []
+    for period, week in [("p1", 2), ("p2", 3), (None, 1)]:
+        rows = layout.rows(df, period, week)
+        mask = np.ones(len(df), dtype=bool)
+        if period is not None:
+            mask &= df['Period'].eq(period).to_numpy()
+        mask &= df['Week_Number'].eq(week).fillna(False).to_numpy()
+        assert rows['Merchants'].tolist() == df[mask]['Merchants'].tolist()
+
+
+def test_single_run_is_a_slice_without_copying():
+    df = partitioned_rows()
+    rows = PartitionLayout(df).rows(df, period="p2")
+    assert np.shares_memory(rows['Period'].array.codes, df['Period'].array.codes)
+
+
+def test_clip_keeps_ids_inside_the_ranges():
+    df = partitioned_rows()
+    layout = PartitionLayout(df)
+    ids = np.array([0, 2, 4, 5, 6, 7], dtype=np.int32)
+    assert layout.clip(ids, week=1).tolist() == [0, 5]
+    assert layout.clip(ids, period="p1").tolist() == [0, 2, 4]
+    assert layout.clip(ids, period="p1", week=3).tolist() == []
+    assert layout.clip(ids[:0], week=1).tolist() == []
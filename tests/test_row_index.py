@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from row_index import RowIndex
+
+
+@pytest.fixture
+def rows():
+    n = 2000
+    return pd.DataFrame({
+        'Merchants': pd.Categorical([f"M{i % 50}" for i in range(n)]),
+        'Sales': [["Ann", "Bob", "Cid", None][i % 4] for i in range(n)],
+        'IT Support Tier': pd.Categorical([["BUG", "CODE", "TRAINING"][i % 3] for i in range(n)]),
+    })
+
+
+def expected(df, filters):
+    mask = np.ones(len(df), dtype=bool)
+    for dim, values in filters.items():
+        mask &= df[dim].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize("values", [["Ann"], ["Ann", "Cid"], ["Ann", "Bob", "Cid"], ["Nobody"], ["Bob", "Nobody"]])
+def test_values_of_one_dimension_are_ored(rows, values):
+    index = RowIndex(rows, ['Sales'])
+    ids = index.rows_for('Sales', values)
+    assert ids.tolist() == expected(rows, {'Sales': values}).tolist()
+
+
+@pytest.mark.parametrize("filters", [
+    {'Sales': ["Ann"], 'IT Support Tier': ["BUG"]},
+    # Sparse sets, intersected by binary search
+    {'Merchants': ["M3", "M17"], 'Sales': ["Bob"]},
+    # Dense sets, intersected with a row mask
+    {'Sales': ["Ann", "Bob", "Cid"], 'IT Support Tier': ["BUG", "CODE"], 'Merchants': [f"M{i}" for i in range(40)]},
+    {'Merchants': ["M1"], 'IT Support Tier': ["TRAINING"], 'Sales': ["Cid"]},
+    {'Sales': ["Nobody"], 'IT Support Tier': ["BUG"]},
+])
+def test_dimensions_are_anded(rows, filters):
+    index = RowIndex(rows, list(rows.columns))
+    ids = index.rows(filters)
+    assert ids.tolist() == expected(rows, filters).tolist()
+    assert np.all(np.diff(ids) > 0)
+
+
+def test_no_filters_select_every_row(rows):
+    index = RowIndex(rows, ['Sales'])
+    assert index.rows({}).tolist() == list(range(len(rows)))
+
+
+def test_missing_columns_are_not_indexed(rows):
+    index = RowIndex(rows, ['Sales', 'Features Category'])
+    assert index.has('Sales')
+    assert not index.has('Features Category')